@@ -1,21 +1,111 @@
-from .converter import MarkdownConverter, convert_text
-from .plugins.container import Container, ContainerColor
-from .renderer import HTMLRenderer, PageOption, ScreenshotOption
-from .utils import MdPlugin
+from __future__ import annotations
+
+import importlib
+from threading import Lock
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .assets import AssetStore
+    from .cache import RenderCache, with_cache_token
+    from .converter import ConverterProcessPool, MarkdownConverter
+    from .encoder import EncodedImage
+    from .metrics import RenderObserver, RenderRecord
+    from .plugins.container import Container, ContainerColor, ContainerGroup
+    from .pool import PagePool
+    from .renderer import HTMLRenderer, PageOption, ReadyOption, ScreenshotOption
+    from .scheduler import QueueFullError, QueueTimeoutError, RenderScheduler
+    from .shard import BrowserShards, ShardStats
+    from .text import convert_text
+    from .utils import MdPlugin
+    from .warmup import WarmupService
 
 __all__ = [
     "convert_text",
     "convert_md",
+    "aconvert_md",
     "MarkdownConverter",
+    "ConverterProcessPool",
     "Container",
     "ContainerColor",
+    "ContainerGroup",
     "HTMLRenderer",
     "PageOption",
     "ScreenshotOption",
+    "ReadyOption",
+    "EncodedImage",
+    "PagePool",
+    "RenderCache",
+    "with_cache_token",
+    "AssetStore",
+    "RenderScheduler",
+    "QueueFullError",
+    "QueueTimeoutError",
+    "BrowserShards",
+    "ShardStats",
+    "WarmupService",
+    "RenderRecord",
+    "RenderObserver",
     "MdPlugin",
 ]
 
-_GLOBAL_MD_CONVERTER = MarkdownConverter()
+# 导出的名称在首次访问时才导入其所在的模块，只使用 `convert_text` 或 `HTMLRenderer` 时
+# 不会导入 markdown-it、Pygments 与 Playwright 中用不到的部分
+_LAZY_EXPORTS = {
+    "AssetStore": ".assets",
+    "RenderCache": ".cache",
+    "with_cache_token": ".cache",
+    "ConverterProcessPool": ".converter",
+    "MarkdownConverter": ".converter",
+    "EncodedImage": ".encoder",
+    "RenderObserver": ".metrics",
+    "RenderRecord": ".metrics",
+    "Container": ".plugins.container",
+    "ContainerColor": ".plugins.container",
+    "ContainerGroup": ".plugins.container",
+    "PagePool": ".pool",
+    "HTMLRenderer": ".renderer",
+    "PageOption": ".renderer",
+    "ReadyOption": ".renderer",
+    "ScreenshotOption": ".renderer",
+    "QueueFullError": ".scheduler",
+    "QueueTimeoutError": ".scheduler",
+    "RenderScheduler": ".scheduler",
+    "BrowserShards": ".shard",
+    "ShardStats": ".shard",
+    "convert_text": ".text",
+    "MdPlugin": ".utils",
+    "WarmupService": ".warmup",
+}
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module = _LAZY_EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
+
+
+_GLOBAL_MD_CONVERTER: MarkdownConverter | None = None
+_GLOBAL_MD_CONVERTER_LOCK = Lock()
+
+
+def _global_md_converter() -> MarkdownConverter:
+    """获取全局的 Markdown 转换器，首次调用时才创建"""
+    global _GLOBAL_MD_CONVERTER
+    if _GLOBAL_MD_CONVERTER is None:
+        with _GLOBAL_MD_CONVERTER_LOCK:
+            if _GLOBAL_MD_CONVERTER is None:
+                from .converter import MarkdownConverter
+
+                _GLOBAL_MD_CONVERTER = MarkdownConverter()
+    return _GLOBAL_MD_CONVERTER
 
 
 def convert_md(content: str) -> str:
@@ -27,4 +117,16 @@ def convert_md(content: str) -> str:
     Returns:
         str: 生成的 HTML 代码
     """
-    return _GLOBAL_MD_CONVERTER.convert(content)
+    return _global_md_converter().convert(content)
+
+
+async def aconvert_md(content: str) -> str:
+    """在线程池中转换 Markdown 文本至 HTML 代码，不阻塞事件循环
+
+    Args:
+        content (str): 要被转换为 HTML 的 Markdown 文本
+
+    Returns:
+        str: 生成的 HTML 代码
+    """
+    return await _global_md_converter().aconvert(content)
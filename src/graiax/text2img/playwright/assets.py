@@ -0,0 +1,241 @@
+"""资源层
+
+通过 `page.route` 为渲染页面提供本地资源，并拦截其他所有网络请求，避免渲染因远程资源而阻塞.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import hashlib
+import mimetypes
+from collections import OrderedDict, deque
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+from urllib.parse import unquote, urlsplit, urlunsplit
+from weakref import WeakKeyDictionary
+
+from loguru import logger
+from playwright.async_api import Page, Request, Route
+
+
+@dataclass
+class AssetStats:
+    """资源请求统计信息"""
+
+    hits: int = 0
+    misses: int = 0
+    aborted: int = 0
+    fallback: int = 0
+    passthrough: int = 0
+
+
+@dataclass
+class _Asset:
+    data: bytes | None
+    path: Path | None
+    content_type: str | None
+
+
+class AssetStore:
+    """资源层
+
+    注册的字节数据与本地文件将直接由内存返回（文件内容按字节数限制缓存在 LRU 中），
+    其余请求默认被立即中止，或者以 `fallback` 指定的替代内容响应.
+
+    用法:
+        ```python
+        assets = AssetStore()
+        assets.add_file("https://example.com/logo.png", "assets/logo.png")
+        assets.add_directory("https://fonts.example.com/", "assets/fonts")
+        renderer = HTMLRenderer(assets=assets)
+        ```
+
+    Args:
+        max_bytes (int, optional): 文件内容缓存的最大字节数. 默认为 32 MiB.
+        fallback (Union[Literal["abort"], bytes, str, Path], optional): 未注册资源的处理方式.
+            为 `abort` 时立即中止请求；为 bytes 时以该内容响应；为文件路径时以该文件的内容响应. 默认为 `abort`.
+            已注册的文件无法读取时同样按此处理；替代文件无法读取时中止请求.
+        passthrough (Sequence[str], optional): 允许正常发出网络请求的 URL 的通配符模式列表.
+        history_size (int, optional): 保留最近多少次渲染的资源统计信息. 默认为 128.
+    """
+
+    max_bytes: int
+    fallback: Literal["abort"] | bytes | Path
+    passthrough: list[str]
+    stats: AssetStats
+    history: deque[AssetStats]
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        *,
+        fallback: Literal["abort"] | bytes | str | Path = "abort",
+        passthrough: Sequence[str] = (),
+        history_size: int = 128,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.fallback = fallback if fallback == "abort" or isinstance(fallback, bytes) else Path(fallback)
+        self.passthrough = list(passthrough)
+        self.stats = AssetStats()
+        self.history = deque(maxlen=history_size)
+        self._assets: dict[str, _Asset] = {}
+        self._directories: list[tuple[str, Path]] = []
+        self._cache: OrderedDict[Path, bytes] = OrderedDict()
+        self._cache_size = 0
+        self._current: WeakKeyDictionary[Page, AssetStats] = WeakKeyDictionary()
+        self._registry_token: str | None = None
+
+    @property
+    def cache_token(self) -> str:
+        """渲染缓存使用的标识，由已注册的资源、目录映射与未注册资源的处理方式决定
+
+        本地文件仅以路径参与计算，文件内容发生变化时请清空渲染缓存.
+        """
+        if self._registry_token is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for url, asset in sorted(self._assets.items(), key=lambda i: i[0]):
+                digest.update(f"{url}\0{asset.path or ''}\0{asset.content_type or ''}\0".encode())
+                if asset.data is not None:
+                    digest.update(hashlib.blake2b(asset.data, digest_size=16).digest())
+            for prefix, directory in self._directories:
+                digest.update(f"{prefix}\0{directory}\0".encode())
+            self._registry_token = digest.hexdigest()
+        fallback = (
+            self.fallback if isinstance(self.fallback, (str, Path)) else hashlib.blake2b(self.fallback).hexdigest()
+        )
+        return f"assets:{self._registry_token}:{fallback}:{self.passthrough!r}"
+
+    def add_bytes(self, url: str, data: bytes, content_type: str | None = None) -> None:
+        """注册一个以字节数据提供的资源
+
+        Args:
+            url (str): 资源的 URL
+            data (bytes): 资源内容
+            content_type (Optional[str], optional): 资源的 MIME 类型，默认根据 URL 推断.
+        """
+        self._assets[_normalize(url)] = _Asset(data, None, content_type or _guess_type(urlsplit(url).path))
+        self._registry_token = None
+
+    def add_file(self, url: str, path: str | Path, content_type: str | None = None) -> None:
+        """注册一个以本地文件提供的资源，文件在首次被请求时读取
+
+        Args:
+            url (str): 资源的 URL
+            path (Union[str, Path]): 本地文件路径
+            content_type (Optional[str], optional): 资源的 MIME 类型，默认根据文件名推断.
+        """
+        path = Path(path)
+        self._assets[_normalize(url)] = _Asset(None, path, content_type or _guess_type(path.name))
+        self._registry_token = None
+
+    def add_directory(self, prefix: str, directory: str | Path) -> None:
+        """将以 `prefix` 开头的 URL 映射到本地目录中的文件
+
+        Args:
+            prefix (str): URL 前缀，如 `https://example.com/static/`
+            directory (Union[str, Path]): 本地目录
+        """
+        self._directories.append((prefix, Path(directory).resolve()))
+        self._registry_token = None
+
+    async def install(self, page: Page) -> None:
+        """在页面上安装资源路由，可直接作为 page_modifier 使用"""
+        await page.route("**/*", lambda route, request: self._handle(page, route, request))
+
+    def begin(self, page: Page) -> AssetStats:
+        """开始统计页面的一次渲染中的资源请求，返回本次渲染的统计信息"""
+        stats = AssetStats()
+        self._current[page] = stats
+        self.history.append(stats)
+        return stats
+
+    def clear_cache(self) -> None:
+        """清空文件内容缓存"""
+        self._cache.clear()
+        self._cache_size = 0
+
+    async def _handle(self, page: Page, route: Route, request: Request) -> None:
+        counters = [self.stats]
+        if (current := self._current.get(page)) is not None:
+            counters.append(current)
+
+        url = request.url
+        try:
+            data, content_type = await self._lookup(url)
+        except OSError as e:
+            # 无法读取的本地文件按未注册资源处理，不能让路由一直挂起
+            logger.warning(f"Failed to read the asset for {url}: {e!r}")
+            data = content_type = None
+        if data is not None:
+            for stats in counters:
+                stats.hits += 1
+            await route.fulfill(body=data, content_type=content_type, status=200)
+            return
+        if any(fnmatch.fnmatchcase(url, pattern) for pattern in self.passthrough):
+            for stats in counters:
+                stats.passthrough += 1
+            await route.continue_()
+            return
+
+        for stats in counters:
+            stats.misses += 1
+        body: bytes | None = None
+        if isinstance(self.fallback, bytes):
+            body = self.fallback
+        elif isinstance(self.fallback, Path):
+            try:
+                body = await self._read(self.fallback)
+            except OSError as e:
+                logger.warning(f"Failed to read the fallback {self.fallback}: {e!r}")
+            content_type = _guess_type(self.fallback.name)
+        if body is None:
+            for stats in counters:
+                stats.aborted += 1
+            await route.abort()
+            return
+        for stats in counters:
+            stats.fallback += 1
+        await route.fulfill(body=body, content_type=content_type, status=200)
+
+    async def _lookup(self, url: str) -> tuple[bytes | None, str | None]:
+        normalized = _normalize(url)
+        asset = self._assets.get(normalized)
+        if asset is not None:
+            if asset.data is not None:
+                return asset.data, asset.content_type
+            assert asset.path is not None
+            return await self._read(asset.path), asset.content_type
+        location = normalized.split("?", 1)[0]
+        for prefix, directory in self._directories:
+            if location.startswith(prefix):
+                path = (directory / unquote(location[len(prefix) :])).resolve()
+                if path.is_relative_to(directory) and path.is_file():
+                    return await self._read(path), _guess_type(path.name)
+        return None, None
+
+    async def _read(self, path: Path) -> bytes:
+        data = self._cache.get(path)
+        if data is not None:
+            self._cache.move_to_end(path)
+            return data
+        data = await asyncio.to_thread(path.read_bytes)
+        if len(data) <= self.max_bytes:
+            self._cache[path] = data
+            self._cache_size += len(data)
+            while self._cache_size > self.max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted)
+        return data
+
+
+def _normalize(url: str) -> str:
+    # 忽略 URL 中的 fragment
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, parts.query, ""))
+
+
+def _guess_type(name: str) -> str | None:
+    return mimetypes.guess_type(name)[0]
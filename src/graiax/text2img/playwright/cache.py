@@ -0,0 +1,242 @@
+"""渲染结果缓存
+
+以最终 HTML、样式与截图/页面参数的哈希为键缓存渲染结果，重复渲染时无需再经过浏览器.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from threading import RLock
+from typing import Any, TypeVar
+
+_Modifier = TypeVar("_Modifier", bound=Callable[..., Any])
+
+
+def with_cache_token(modifier: _Modifier, token: str) -> _Modifier:
+    """为 page_modifier 标记缓存标识
+
+    page_modifier 可能捕获任意状态，无法从函数本身判断其行为，因此含有未标记的 page_modifier 的渲染不会被缓存.
+    标记后，`token` 相同的 page_modifier 被视为对页面做出相同的修改. 也可以直接为函数或其所属对象设置
+    `cache_token` 属性.
+
+    Args:
+        modifier (Callable): 要标记的 page_modifier，不能为绑定方法
+        token (str): 缓存标识，行为不同的 page_modifier 应使用不同的标识
+
+    Returns:
+        Callable: 传入的 page_modifier
+    """
+    modifier.cache_token = token  # type: ignore[attr-defined]
+    return modifier
+
+
+def _modifier_token(modifier: Callable[..., Any]) -> str | None:
+    token = getattr(modifier, "cache_token", None)
+    if token is None and (owner := getattr(modifier, "__self__", None)) is not None:
+        token = getattr(owner, "cache_token", None)
+    return None if token is None else str(token)
+
+
+@dataclass
+class CacheStats:
+    """缓存统计信息"""
+
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class RenderCache:
+    """渲染结果缓存
+
+    内存中保存一个按字节数限制大小的 LRU，可选地在磁盘目录中保存第二级缓存.
+
+    Args:
+        max_bytes (int, optional): 内存缓存的最大字节数. 默认为 64 MiB.
+        directory (Optional[Union[str, Path]], optional): 磁盘缓存目录，不传入则不使用磁盘缓存.
+        disk_max_bytes (int, optional): 磁盘缓存的最大字节数，超出时删除最久未写入的文件. 默认为 512 MiB.
+        ttl (Optional[float], optional): 磁盘缓存的有效期（秒），为 None 时永不过期. 默认为 1 天.
+    """
+
+    max_bytes: int
+    directory: Path | None
+    disk_max_bytes: int
+    ttl: float | None
+    stats: CacheStats
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        *,
+        directory: str | Path | None = None,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+        ttl: float | None = 24 * 60 * 60,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory is not None else None
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_size = 0
+        self._disk_size: int | None = None
+        # 磁盘读写在线程中进行，目录大小的统计与文件的替换、删除需要互斥
+        self._disk_lock = RLock()
+
+    @staticmethod
+    def make_key(
+        html: str,
+        style: str,
+        screenshot_option: Mapping[str, Any],
+        page_option: Mapping[str, Any],
+        page_modifiers: Iterable[Callable[..., Any]] = (),
+        variant: str = "",
+    ) -> str | None:
+        """计算缓存键
+
+        `path` 仅影响结果的保存位置，不参与计算；含有 `mask` 或未标记缓存标识（见 `with_cache_token`）的
+        page_modifier 时无法缓存，返回 None. `variant` 用于区分会影响渲染结果的渲染器设置.
+        """
+        if screenshot_option.get("mask"):
+            return None
+        tokens = [_modifier_token(i) for i in page_modifiers]
+        if None in tokens:
+            return None
+        options = {k: v for k, v in screenshot_option.items() if k != "path"}
+        digest = hashlib.blake2b(digest_size=20)
+        for part in (
+            html,
+            style,
+            json.dumps(options, sort_keys=True, default=repr),
+            json.dumps(page_option, sort_keys=True, default=repr),
+            variant,
+            *(f"modifier:{i}" for i in tokens),
+        ):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> bytes | None:
+        """读取缓存，内存未命中时查找磁盘缓存"""
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            self.stats.hits += 1
+            self.stats.memory_hits += 1
+            return data
+        if self.directory is not None:
+            data = await asyncio.to_thread(self._disk_read, key)
+            if data is not None:
+                self._memory_put(key, data)
+                self.stats.hits += 1
+                self.stats.disk_hits += 1
+                return data
+        self.stats.misses += 1
+        return None
+
+    async def set(self, key: str, data: bytes) -> None:
+        """写入缓存"""
+        self._memory_put(key, data)
+        if self.directory is not None:
+            await asyncio.to_thread(self._disk_write, key, data)
+
+    def clear(self) -> None:
+        """清空内存缓存"""
+        self._memory.clear()
+        self._memory_size = 0
+
+    def _memory_put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old)
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self.stats.evictions += 1
+
+    def _disk_path(self, key: str) -> Path:
+        assert self.directory is not None
+        return self.directory / key[:2] / key
+
+    def _disk_read(self, key: str) -> bytes | None:
+        path = self._disk_path(key)
+        try:
+            if self.ttl is not None and path.stat().st_mtime < time.time() - self.ttl:
+                self._disk_remove(path)
+                return None
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _disk_write(self, key: str, data: bytes) -> None:
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 每次写入使用独立的临时文件，同一个键的并发写入互不干扰，替换为最终文件是原子的
+        fd, tmp = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            with self._disk_lock:
+                if self._disk_size is None:
+                    self._disk_size = sum(i.stat().st_size for i in self._disk_files())
+                try:
+                    self._disk_size -= path.stat().st_size
+                except FileNotFoundError:
+                    pass
+                os.replace(tmp, path)
+                self._disk_size += len(data)
+                if self._disk_size > self.disk_max_bytes:
+                    self._disk_evict()
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _disk_files(self) -> list[Path]:
+        assert self.directory is not None
+        if not self.directory.exists():
+            return []
+        return [i for i in self.directory.glob("??/*") if i.is_file() and not i.name.endswith(".tmp")]
+
+    def _disk_evict(self) -> None:
+        # 调用方已持有 _disk_lock
+        expire = time.time() - self.ttl if self.ttl is not None else None
+        files = sorted(((i.stat(), i) for i in self._disk_files()), key=lambda i: i[0].st_mtime)
+        for stat, path in files:
+            if (
+                self._disk_size is not None
+                and self._disk_size <= self.disk_max_bytes
+                and (expire is None or stat.st_mtime >= expire)
+            ):
+                break
+            self._disk_remove(path, stat.st_size)
+            self.stats.evictions += 1
+
+    def _disk_remove(self, path: Path, size: int | None = None) -> None:
+        with self._disk_lock:
+            try:
+                size = path.stat().st_size if size is None else size
+                path.unlink()
+            except FileNotFoundError:
+                return
+            if self._disk_size is not None:
+                self._disk_size -= size
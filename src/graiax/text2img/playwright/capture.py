@@ -0,0 +1,100 @@
+"""基于 Chromium CDP 的截图
+
+直接调用 `Page.captureScreenshot`，支持 WebP 格式，并跳过 Playwright 截整页时的额外步骤.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from weakref import WeakKeyDictionary
+
+from playwright.async_api import CDPSession, Page
+from playwright.async_api import Error as PWError
+
+from .utils import write_file
+
+if TYPE_CHECKING:
+    from .renderer import ScreenshotOption
+
+# 每个页面对应的 CDP 会话，不支持 CDP 的浏览器（Firefox、WebKit）记为 None
+_SESSIONS: WeakKeyDictionary[Page, CDPSession | None] = WeakKeyDictionary()
+
+
+async def cdp_session(page: Page) -> CDPSession | None:
+    """获取并缓存页面的 CDP 会话，非 Chromium 浏览器返回 None"""
+    if page in _SESSIONS:
+        return _SESSIONS[page]
+    try:
+        session: CDPSession | None = await page.context.new_cdp_session(page)
+    except PWError:
+        session = None
+    _SESSIONS[page] = session
+    return session
+
+
+async def cdp_screenshot(page: Page, session: CDPSession, screenshot_option: ScreenshotOption) -> bytes:
+    """使用 CDP 截图
+
+    支持 `type`（含 `webp`）、`quality`、`full_page`、`clip`、`scale`、`omit_background`、`timeout` 与 `path`，
+    不支持 `mask`，`animations` 与 `caret` 将被忽略.
+    """
+    if screenshot_option.get("mask"):
+        raise ValueError("`mask` is not supported by the CDP capture path.")
+    capture = _capture(page, session, screenshot_option)
+    timeout = screenshot_option.get("timeout")
+    data = await (asyncio.wait_for(capture, timeout / 1000) if timeout else capture)
+    if path := screenshot_option.get("path"):
+        await asyncio.to_thread(write_file, Path(path), data)
+    return data
+
+
+async def _capture(page: Page, session: CDPSession, screenshot_option: ScreenshotOption) -> bytes:
+    image_type = screenshot_option.get("type") or "png"
+    full_page = bool(screenshot_option.get("full_page"))
+    metrics = await session.send("Page.getLayoutMetrics")
+    viewport = metrics["cssVisualViewport"]
+
+    clip: dict[str, Any]
+    if (rect := screenshot_option.get("clip")) is not None:
+        # 与 page.screenshot 一致：非整页截图时 clip 相对于当前视口
+        offset_x, offset_y = (0, 0) if full_page else (viewport["pageX"], viewport["pageY"])
+        clip = {"x": rect["x"] + offset_x, "y": rect["y"] + offset_y, "width": rect["width"], "height": rect["height"]}
+    elif full_page:
+        content = metrics["cssContentSize"]
+        clip = {"x": 0, "y": 0, "width": content["width"], "height": content["height"]}
+    else:
+        clip = {
+            "x": viewport["pageX"],
+            "y": viewport["pageY"],
+            "width": viewport["clientWidth"],
+            "height": viewport["clientHeight"],
+        }
+    clip["scale"] = 1 / await page.evaluate("window.devicePixelRatio") if screenshot_option.get("scale") == "css" else 1
+    beyond_viewport = (
+        clip["x"] < viewport["pageX"]
+        or clip["y"] < viewport["pageY"]
+        or clip["x"] + clip["width"] > viewport["pageX"] + viewport["clientWidth"]
+        or clip["y"] + clip["height"] > viewport["pageY"] + viewport["clientHeight"]
+    )
+
+    params: dict[str, Any] = {
+        "format": image_type,
+        "clip": clip,
+        "captureBeyondViewport": beyond_viewport,
+        "fromSurface": True,
+    }
+    if image_type != "png" and (quality := screenshot_option.get("quality")) is not None:
+        params["quality"] = quality
+
+    transparent = bool(screenshot_option.get("omit_background")) and image_type != "jpeg"
+    if transparent:
+        await session.send("Emulation.setDefaultBackgroundColorOverride", {"color": {"r": 0, "g": 0, "b": 0, "a": 0}})
+    try:
+        result = await session.send("Page.captureScreenshot", params)
+    finally:
+        if transparent:
+            await session.send("Emulation.setDefaultBackgroundColorOverride")
+    return base64.b64decode(result["data"])
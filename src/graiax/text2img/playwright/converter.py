@@ -3,10 +3,21 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import itertools
+import re
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
 from enum import Enum
-from typing import Sequence, overload
+from threading import Lock
+from typing import overload
 
 from markdown_it import MarkdownIt
+from markdown_it.rules_core.normalize import NEWLINES_RE, NULL_RE
+from markdown_it.token import Token
 from mdit_py_emoji import emoji_plugin
 from mdit_py_plugins.anchors.index import anchors_plugin
 from mdit_py_plugins.footnote.index import footnote_plugin
@@ -16,22 +27,11 @@ from mdit_py_plugins.tasklists import tasklists_plugin
 from .plugins import container
 from .plugins.code import code_plugin
 from .plugins.code.highlighter import Highlighter
+from .plugins.code.language_resolver import languages_map, resolve_language
+from .text import convert_text
 from .utils import MdPlugin, MdPluginBase
 
 
-def convert_text(text: str) -> str:
-    """将纯文本转换为 HTML 代码
-
-    Args:
-        text (str): 待转换的文本
-
-    Returns:
-        str: 生成的 HTML 代码
-    """
-    text = text.replace("\r\n", "\n").replace("\r", "\n").strip()
-    return "".join(('<div class="container">', "".join(f"<p>{s}</p>" for s in text.split("\n")), "</div>"))
-
-
 class DefaultPlugin(Enum):
     """默认 MarkdownIt 插件"""
 
@@ -45,6 +45,60 @@ class DefaultPlugin(Enum):
     code = MdPlugin(code_plugin)
 
 
+_HEADING_ID = re.compile(r'<h[1-6] id="([^"]*)"')
+
+_DEFAULT_PLUGINS = (
+    DefaultPlugin.emoji,
+    DefaultPlugin.anchors,
+    DefaultPlugin.footnote,
+    DefaultPlugin.front_matter,
+    DefaultPlugin.task_lists,
+    DefaultPlugin.code,
+)
+_DEFAULT_EXTRA_PLUGINS = (container.ContainerGroup((container.TIP, container.WARNING, container.DANGER)),)
+_DEFAULT_HIGHLIGHTER = Highlighter()
+
+# 预热时转换的示例文档，覆盖默认插件处理的各种语法
+_WARMUP_MARKDOWN = """---
+title: warmup
+---
+
+# 预热 Warmup
+
+中文与 English 混排，**粗体**、*斜体*、`code`、[链接](https://example.com)、https://example.com 与 :smile:[^1]
+
+- [x] 任务
+- [ ] task
+
+> 引用
+
+| A | B |
+| - | - |
+| 1 | 2 |
+
+```python {1}
+def f() -> str:
+    return "字符串"  # 注释
+```
+
+:::tip
+提示
+:::
+
+[^1]: 脚注
+"""
+
+
+@dataclass
+class BlockCacheStats:
+    """增量转换统计信息"""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    fallbacks: int = 0
+
+
 class MarkdownConverter:
     """Markdown To Html 转换器
 
@@ -54,10 +108,22 @@ class MarkdownConverter:
             如不需要或仅需部分，请自行传入包含 DefaultPlugin 的 list 或 tuple.
         extra_plugins (Sequence[MdPluginBase], optional): 额外的 MarkdownIt 插件.
             默认包含 VitePress 自带的 Container，如不需要或仅需部分，请自行传入包含 MdPlugin 的 list 或 tuple.
+            容器较多时，请将它们放入同一个 `ContainerGroup`.
         highlighter (Highlighter, optional): 代码高亮器，如需改变代码高亮样式，请传入此参数并更改 `HTMLRenderer` 的 builtin css.
+        executor (Executor, optional): `aconvert` 默认使用的执行器，为 None 时使用事件循环默认的线程池.
+            如需使用多进程，请传入 `ConverterProcessPool`.
+        block_cache_size (int, optional): 增量转换缓存的最大块数，为 0 时不使用增量转换. 默认为 0.
+            启用后文档按顶层块（段落、标题、列表、表格、代码块、容器等）拆分，按内容哈希缓存每一块的 HTML，
+            只重新转换发生变化的块. 文档包含脚注或引用式链接等跨块结构时自动回退为整体转换.
+            自定义插件的核心规则需只作用于单个块，否则结果可能与整体转换不同.
+        block_cache_max_chars (int, optional): 增量转换缓存中 HTML 的最大总字符数. 默认为 4 * 1024 * 1024.
     """
 
     md: MarkdownIt
+    executor: Executor | None
+    block_cache_size: int
+    block_cache_max_chars: int
+    block_stats: BlockCacheStats
 
     @overload
     def __init__(
@@ -66,7 +132,10 @@ class MarkdownConverter:
         *,
         default_plugins: Sequence[DefaultPlugin] = ...,
         extra_plugins: Sequence[MdPluginBase] = ...,
-        highlighter: Highlighter = Highlighter(),
+        highlighter: Highlighter = _DEFAULT_HIGHLIGHTER,
+        executor: Executor | None = None,
+        block_cache_size: int = 0,
+        block_cache_max_chars: int = 4 * 1024 * 1024,
     ):
         ...
 
@@ -77,6 +146,9 @@ class MarkdownConverter:
         *,
         default_plugins: Sequence[DefaultPlugin] = ...,
         extra_plugins: Sequence[MdPluginBase] = ...,
+        executor: Executor | None = None,
+        block_cache_size: int = 0,
+        block_cache_max_chars: int = 4 * 1024 * 1024,
     ):
         ...
 
@@ -84,21 +156,29 @@ class MarkdownConverter:
         self,
         md: MarkdownIt | None = None,
         *,
-        default_plugins: Sequence[DefaultPlugin] = (
-            DefaultPlugin.emoji,
-            DefaultPlugin.anchors,
-            DefaultPlugin.footnote,
-            DefaultPlugin.front_matter,
-            DefaultPlugin.task_lists,
-            DefaultPlugin.code,
-        ),
-        extra_plugins: Sequence[MdPluginBase] = (
-            container.TIP,
-            container.WARNING,
-            container.DANGER,
-        ),
-        highlighter: Highlighter = Highlighter(),
+        default_plugins: Sequence[DefaultPlugin] = _DEFAULT_PLUGINS,
+        extra_plugins: Sequence[MdPluginBase] = _DEFAULT_EXTRA_PLUGINS,
+        highlighter: Highlighter = _DEFAULT_HIGHLIGHTER,
+        executor: Executor | None = None,
+        block_cache_size: int = 0,
+        block_cache_max_chars: int = 4 * 1024 * 1024,
     ) -> None:
+        self.executor = executor
+        # 产生与本转换器相同结果的工厂函数，进程池只能代替工厂函数与其相同的转换器进行转换
+        self._factory: Callable[[], MarkdownConverter] | None = None
+        if (
+            md is None
+            and tuple(default_plugins) == _DEFAULT_PLUGINS
+            and extra_plugins is _DEFAULT_EXTRA_PLUGINS
+            and highlighter is _DEFAULT_HIGHLIGHTER
+        ):
+            self._factory = MarkdownConverter
+        self.block_cache_size = block_cache_size
+        self.block_cache_max_chars = block_cache_max_chars
+        self.block_stats = BlockCacheStats()
+        self._blocks: OrderedDict[bytes, str] = OrderedDict()
+        self._blocks_chars = 0
+        self._lock = Lock()
         self.md = md or MarkdownIt("gfm-like", {"highlight": highlighter}).enable("table")
         for d in default_plugins:
             d.value.apply(self.md)
@@ -117,4 +197,162 @@ class MarkdownConverter:
         Returns:
             str: 生成的 HTML 代码
         """
-        return f'<div class="markdown-body">{self.md.render(content)}</div>'
+        html = self._render_blocks(content) if self.block_cache_size > 0 else self.md.render(content)
+        return f'<div class="markdown-body">{html}</div>'
+
+    def warmup(self, languages: Iterable[str] | None = None) -> None:
+        """预热转换器
+
+        markdown-it 的规则链、emoji 表与 Pygments 的 Lexer 都在首次使用时才创建，使首次转换明显慢于平时.
+        该方法转换一篇包含常见语法的示例文档，并预先载入 `languages` 对应的 Lexer. 不会写入增量转换缓存.
+
+        Args:
+            languages (Optional[Iterable[str]], optional): 要预先载入 Lexer 的语言或其别名，为 None 时载入
+                `language_resolver.languages_map` 中的所有语言. 仅在使用 `Highlighter` 高亮代码时有效.
+        """
+        self.md.render(_WARMUP_MARKDOWN)
+        highlighter = self.md.options.get("highlight")
+        if not isinstance(highlighter, Highlighter):
+            return
+        # 代码块按解析后的语言名获取 Lexer，预先载入时也使用相同的键
+        for name in {resolve_language(i)["name"] for i in (languages_map if languages is None else languages)}:
+            highlighter.get_lexer(name)
+
+    def clear_cache(self) -> None:
+        """清空增量转换缓存"""
+        with self._lock:
+            self._blocks.clear()
+            self._blocks_chars = 0
+
+    def _render_blocks(self, content: str) -> str:
+        # 内联脚注不会在块级解析中留下痕迹，只能按文本判断
+        if "[^" in content or "^[" in content:
+            return self._fallback(content)
+        content = NULL_RE.sub("\uFFFD", NEWLINES_RE.sub("\n", content))
+        env: dict = {}
+        tokens: list[Token] = []
+        # 只运行块级规则，不解析内联内容，用于得到各个顶层块所在的行
+        self.md.block.parse(content, self.md, env, tokens)
+        if env.get("references") or env.get("footnotes"):
+            return self._fallback(content)
+
+        # 各行在原文中的起始位置，块的原文包含其最后一行的换行符，与整体转换时看到的内容相同
+        starts = [0, *itertools.accumulate(len(line) + 1 for line in content.split("\n"))]
+        parts: list[str] = []
+        for idx, token in enumerate(tokens):
+            if token.level != 0 or token.nesting == -1 or token.map is None:
+                continue
+            begin, end = token.map
+            html = self._render_block(content[starts[begin] : starts[end]])
+            # 与整体渲染一致：紧跟在隐藏的块（如 front matter）之后的块前有一个换行
+            parts.append("\n" + html if idx and tokens[idx - 1].hidden else html)
+        html = "".join(parts)
+
+        # 标题锚点在整个文档内去重，各块单独转换时可能产生重复的 id
+        ids = _HEADING_ID.findall(html)
+        if len(ids) != len(set(ids)):
+            return self._fallback(content)
+        return html
+
+    def _render_block(self, source: str) -> str:
+        key = hashlib.blake2b(source.encode(), digest_size=16).digest()
+        with self._lock:
+            cached = self._blocks.get(key)
+            if cached is not None:
+                self._blocks.move_to_end(key)
+                self.block_stats.hits += 1
+                return cached
+            self.block_stats.misses += 1
+
+        html = self.md.render(source)
+        if len(html) > self.block_cache_max_chars:
+            return html
+        with self._lock:
+            if key not in self._blocks:
+                self._blocks[key] = html
+                self._blocks_chars += len(html)
+            while len(self._blocks) > self.block_cache_size or self._blocks_chars > self.block_cache_max_chars:
+                _, evicted = self._blocks.popitem(last=False)
+                self._blocks_chars -= len(evicted)
+                self.block_stats.evictions += 1
+        return html
+
+    def _fallback(self, content: str) -> str:
+        self.block_stats.fallbacks += 1
+        return self.md.render(content)
+
+    async def aconvert(self, content: str, *, executor: Executor | None = None) -> str:
+        """在执行器中转换 Markdown 文本至 HTML 代码，不阻塞事件循环
+
+        Args:
+            content (str): 要被转换为 HTML 的 Markdown 文本
+            executor (Executor, optional): 本次转换使用的执行器，默认使用 `self.executor`.
+                使用进程池时必须为 `ConverterProcessPool`，转换由进程中以其 `factory` 创建的转换器完成，
+                因此本转换器必须由 `ConverterProcessPool.converter` 创建（使用默认参数的转换器对应默认的进程池）.
+
+        Raises:
+            ValueError: 进程池中的转换器与本转换器的设置不同
+
+        Returns:
+            str: 生成的 HTML 代码
+        """
+        executor = executor or self.executor
+        loop = asyncio.get_running_loop()
+        if isinstance(executor, ConverterProcessPool):
+            if self._factory is None or self._factory is not executor.factory:
+                raise ValueError(
+                    "The process pool converts with its own `factory`, which may differ from this converter. "
+                    "Create the converter with `ConverterProcessPool.converter()` instead."
+                )
+            return await loop.run_in_executor(executor, _worker_convert, content)
+        if isinstance(executor, ProcessPoolExecutor):
+            raise ValueError("Process pools must be created with `ConverterProcessPool`.")
+        return await loop.run_in_executor(executor, self.convert, content)
+
+
+_WORKER_CONVERTER: MarkdownConverter | None = None
+
+
+def _init_worker(factory: Callable[[], MarkdownConverter]) -> None:
+    global _WORKER_CONVERTER
+    _WORKER_CONVERTER = factory()
+
+
+def _worker_convert(content: str) -> str:
+    if _WORKER_CONVERTER is None:
+        raise RuntimeError("Converter worker has not been initialized.")
+    return _WORKER_CONVERTER.convert(content)
+
+
+class ConverterProcessPool(ProcessPoolExecutor):
+    """用于 Markdown 转换的进程池
+
+    每个工作进程启动时调用一次 `factory` 创建并持有自己的 `MarkdownConverter`，
+    之后的转换均复用该实例. 转换结果只由 `factory` 决定，请使用 `converter()` 创建与之对应的转换器.
+
+    Args:
+        max_workers (int, optional): 最大进程数，默认为 CPU 核心数.
+        factory (Callable[[], MarkdownConverter], optional): 在工作进程中创建转换器的函数，
+            必须可以被 pickle（如模块级函数）. 默认为 `MarkdownConverter`.
+        **kwargs: 传递给 `ProcessPoolExecutor` 的其他参数.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        factory: Callable[[], MarkdownConverter] = MarkdownConverter,
+        **kwargs,
+    ) -> None:
+        super().__init__(max_workers, initializer=_init_worker, initargs=(factory,), **kwargs)
+        self.factory = factory
+
+    def converter(self) -> MarkdownConverter:
+        """在当前进程中以 `factory` 创建一个转换器，其 `aconvert` 默认在本进程池中进行
+
+        Returns:
+            MarkdownConverter: 与工作进程中的转换器设置相同的转换器
+        """
+        converter = self.factory()
+        converter.executor = self
+        converter._factory = self.factory
+        return converter
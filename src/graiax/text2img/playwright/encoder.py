@@ -0,0 +1,199 @@
+"""按字节数限制编码图片
+
+只截图一次无损的 PNG，之后对 JPEG 或 WebP 的质量以及缩放比例进行二分查找，得到不超过限制时质量最高的图片.
+需要安装可选依赖 Pillow: `pip install graiax-text2img-playwright[encoder]`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from functools import partial
+from typing import Literal
+
+try:
+    from PIL import Image
+except ImportError as e:
+    raise ImportError(
+        "Encoding within `max_bytes` requires Pillow, "
+        "install it with `pip install graiax-text2img-playwright[encoder]`."
+    ) from e
+
+# 缩放比例二分查找的次数，精度约为 (1 - min_scale) / 2 ** 6
+_SCALE_STEPS = 6
+
+
+@dataclass
+class EncodedImage:
+    """按字节数限制编码得到的图片
+
+    Attributes:
+        data (bytes): 图片的字节
+        type (Literal["jpeg", "webp"]): 图片格式
+        quality (int): 选中的质量
+        scale (float): 相对于截图的缩放比例，为 1 时未缩放
+        width (int): 图片宽度
+        height (int): 图片高度
+        attempts (int): 查找过程中编码的次数
+    """
+
+    data: bytes
+    type: Literal["jpeg", "webp"]
+    quality: int
+    scale: float
+    width: int
+    height: int
+    attempts: int
+
+
+class _Encoder:
+    def __init__(self, image: Image.Image, type: Literal["jpeg", "webp"], max_bytes: int) -> None:
+        self.image = image
+        self.type = type
+        self.max_bytes = max_bytes
+        self.attempts = 0
+
+    def encode(self, image: Image.Image, quality: int) -> bytes:
+        self.attempts += 1
+        buffer = io.BytesIO()
+        image.save(buffer, self.type.upper(), quality=quality)
+        return buffer.getvalue()
+
+    def resize(self, scale: float) -> Image.Image:
+        if scale >= 1:
+            return self.image
+        size = (max(1, round(self.image.width * scale)), max(1, round(self.image.height * scale)))
+        return self.image.resize(size, Image.Resampling.LANCZOS)
+
+    def best_quality(self, image: Image.Image, min_quality: int, max_quality: int) -> tuple[int, bytes] | None:
+        """不超过限制时的最高质量，最低质量也超出限制时返回 None"""
+        data = self.encode(image, max_quality)
+        if len(data) <= self.max_bytes:
+            return max_quality, data
+        best: tuple[int, bytes] | None = None
+        low, high = min_quality, max_quality - 1
+        while low <= high:
+            quality = (low + high) // 2
+            data = self.encode(image, quality)
+            if len(data) <= self.max_bytes:
+                best = quality, data
+                low = quality + 1
+            else:
+                high = quality - 1
+        return best
+
+
+def _prepare(source: Image.Image, type: Literal["jpeg", "webp"]) -> Image.Image:
+    """转换为编码使用的模式，WebP 保留透明通道，JPEG 不支持透明通道，透明部分按白色背景合成"""
+    if source.mode not in ("RGBA", "LA", "PA") and not (source.mode == "P" and "transparency" in source.info):
+        return source.convert("RGB")
+    image = source.convert("RGBA")
+    if type == "webp":
+        return image
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def fit_bytes(
+    image: bytes,
+    max_bytes: int,
+    *,
+    type: Literal["jpeg", "webp"] = "jpeg",
+    max_quality: int = 90,
+    min_quality: int = 10,
+    min_scale: float = 0.25,
+) -> EncodedImage:
+    """将图片编码为不超过 `max_bytes` 字节的 JPEG 或 WebP
+
+    先在原尺寸下二分查找质量；最低质量仍超出限制时，以最低质量二分查找最大的缩放比例，再在该比例下查找质量.
+    即优先保留分辨率，其次保留质量.
+    WebP 保留原始图片的透明通道；JPEG 不支持透明通道，透明部分以白色背景合成.
+
+    Args:
+        image (bytes): 原始图片，通常为无损的 PNG 截图
+        max_bytes (int): 编码结果的最大字节数
+        type (Literal["jpeg", "webp"], optional): 输出格式. 默认为 `jpeg`.
+        max_quality (int, optional): 质量的上限. 默认为 90.
+        min_quality (int, optional): 质量的下限. 默认为 10.
+        min_scale (float, optional): 缩放比例的下限. 默认为 0.25.
+
+    Raises:
+        ValueError: 以最低质量与最小缩放比例编码仍超出限制
+
+    Returns:
+        EncodedImage: 编码结果与选中的参数
+    """
+    if not 0 < min_scale <= 1:
+        raise ValueError("`min_scale` must be in (0, 1].")
+    if not 1 <= min_quality <= max_quality <= 100:
+        raise ValueError("Qualities must satisfy 1 <= `min_quality` <= `max_quality` <= 100.")
+
+    with Image.open(io.BytesIO(image)) as source:
+        encoder = _Encoder(_prepare(source, type), type, max_bytes)
+
+    scale = 1.0
+    resized = encoder.image
+    found = encoder.best_quality(resized, min_quality, max_quality)
+    if found is None:
+        smallest = encoder.resize(min_scale)
+        if len(encoder.encode(smallest, min_quality)) > max_bytes:
+            raise ValueError(f"Cannot encode the image within {max_bytes} bytes.")
+        low, high = min_scale, 1.0
+        for _ in range(_SCALE_STEPS):
+            middle = (low + high) / 2
+            if len(encoder.encode(encoder.resize(middle), min_quality)) <= max_bytes:
+                low = middle
+            else:
+                high = middle
+        scale = low
+        resized = encoder.resize(scale)
+        found = encoder.best_quality(resized, min_quality, max_quality)
+        assert found is not None
+
+    quality, data = found
+    return EncodedImage(
+        data=data,
+        type=type,
+        quality=quality,
+        scale=scale,
+        width=resized.width,
+        height=resized.height,
+        attempts=encoder.attempts,
+    )
+
+
+async def afit_bytes(
+    image: bytes,
+    max_bytes: int,
+    *,
+    type: Literal["jpeg", "webp"] = "jpeg",
+    max_quality: int = 90,
+    min_quality: int = 10,
+    min_scale: float = 0.25,
+    executor: Executor | None = None,
+) -> EncodedImage:
+    """在执行器中进行 `fit_bytes`，不阻塞事件循环
+
+    Args:
+        executor (Executor, optional): 使用的执行器，为 None 时使用事件循环默认的线程池.
+        其余参数同 `fit_bytes`.
+
+    Returns:
+        EncodedImage: 编码结果与选中的参数
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor,
+        partial(
+            fit_bytes,
+            image,
+            max_bytes,
+            type=type,
+            max_quality=max_quality,
+            min_quality=min_quality,
+            min_scale=min_scale,
+        ),
+    )
@@ -0,0 +1,88 @@
+"""渲染指标
+
+每次渲染都会生成一条 `RenderRecord`，记录各阶段的耗时、HTML/CSS/图片的大小与所使用的页面来源，
+并交给 `HTMLRenderer` 的观察者处理. 观察者可以将其转发到 Prometheus、OpenTelemetry 等监控系统.
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Literal
+
+RenderPath = Literal["global_context", "new_context", "browser", "context"]
+RenderStage = Literal["queue", "acquire", "modifiers", "set_content", "ready", "screenshot"]
+
+
+@dataclass
+class RenderRecord:
+    """一次渲染的指标
+
+    Attributes:
+        path (Optional[RenderPath]): 页面的来源. `global_context` 为 PlaywrightService 的全局上下文，
+            `new_context` 为按页面设置新建的上下文，`browser` 与 `context` 分别为调用时传入的浏览器与上下文.
+            命中渲染缓存时为 None.
+        pooled (bool): 页面是否来自页面池.
+        shard (Optional[int]): 使用浏览器分片时，所使用的分片的下标.
+        cached (bool): 是否命中了渲染缓存.
+        coalesced (bool): 是否与另一个相同的并发渲染合并，直接使用了其结果.
+        html_bytes (int): HTML 代码的字节数.
+        css_bytes (int): 实际载入的样式表的字节数，启用裁剪时为裁剪后的大小.
+        image_bytes (int): 图片的字节数，分块渲染时为所有分块之和.
+        stages (Dict[RenderStage, float]): 各阶段的耗时（秒）. `queue` 为在调度器中排队，`acquire` 为获取页面，
+            `modifiers` 为执行 page_modifiers，`set_content` 为载入内容，`ready` 为等待字体与自定义条件，
+            `screenshot` 为测量与截图. 未经过的阶段不会出现.
+        total (float): 整个渲染的耗时（秒）.
+        started_at (float): 渲染开始时的 `time.time()`.
+        error (Optional[BaseException]): 渲染失败时的异常.
+    """
+
+    path: RenderPath | None = None
+    pooled: bool = False
+    shard: int | None = None
+    cached: bool = False
+    coalesced: bool = False
+    html_bytes: int = 0
+    css_bytes: int = 0
+    image_bytes: int = 0
+    stages: dict[RenderStage, float] = field(default_factory=dict)
+    total: float = 0.0
+    started_at: float = field(default_factory=time.time)
+    error: BaseException | None = None
+
+
+RenderObserver = Callable[[RenderRecord], Awaitable[None] | None]
+
+_CURRENT: ContextVar[RenderRecord | None] = ContextVar("graiax_text2img_render_record", default=None)
+
+
+def current_record() -> RenderRecord | None:
+    """获取当前正在进行的渲染的指标记录，未启用观察者时为 None"""
+    return _CURRENT.get()
+
+
+@contextmanager
+def activate(record: RenderRecord | None) -> Iterator[None]:
+    """在上下文中将 `record` 设为当前记录"""
+    token = _CURRENT.set(record)
+    try:
+        yield
+    finally:
+        _CURRENT.reset(token)
+
+
+@contextmanager
+def stage(name: RenderStage) -> Iterator[None]:
+    """统计当前记录中某一阶段的耗时，同一阶段多次进入时累加"""
+    record = _CURRENT.get()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.stages[name] = record.stages.get(name, 0.0) + time.perf_counter() - start
@@ -24,8 +24,10 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+from __future__ import annotations
+
 import re
-from typing import List, MutableMapping
+from collections.abc import MutableMapping
 
 from markdown_it import MarkdownIt
 from markdown_it.common.utils import escapeHtml, unescapeAll
@@ -33,38 +35,71 @@ from markdown_it.renderer import RendererHTML
 from markdown_it.token import Token
 from markdown_it.utils import OptionsDict
 
-from .highlight_lines import is_highlight_line, resolve_highlight_lines
+from .highlight_lines import HighlightLinesRange, highlight_line_set, resolve_highlight_lines
 from .language_resolver import resolve_language
 
-
-def fence(md: RendererHTML, tokens: List[Token], idx: int, options: OptionsDict, env: MutableMapping):
+_NO_LINE_NUMBERS = re.compile(r":no-line-numbers\b")
+
+
+def fence(
+    md: RendererHTML,
+    tokens: list[Token],
+    idx: int,
+    options: OptionsDict,
+    env: MutableMapping,
+    *,
+    compact_lines: int | None = None,
+    max_lines: int | None = None,
+    tail_lines: int = 0,
+    fold_marker: str = "… {count} more lines",
+):
     token: Token = tokens[idx]
 
     info = token.info if unescapeAll(token.info).strip() else ""
     language = resolve_language(info)
     language_class = f'{options["langPrefix"]}{language["name"].lower()}'
-    code: str = (
-        options["highlight"](code=token.content, lang=language["name"])
-        if options["highlight"]
-        else escapeHtml(token.content)
-    )
-    result = code if code.startswith("<pre") else f'<pre class="{language_class}"><code>{code}</code></pre>'
-    lines = code.split("\n")[:-1]
     highlight_lines_ranges = resolve_highlight_lines(info)
+    use_line_numbers = _NO_LINE_NUMBERS.search(info) is None
+
+    result = None
+    lines = token.content.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    if (max_lines is not None and len(lines) > max_lines) or (compact_lines is not None and len(lines) > compact_lines):
+        result = _compact(
+            lines,
+            language["name"],
+            language_class,
+            options,
+            highlight_lines_ranges,
+            use_line_numbers,
+            max_lines,
+            tail_lines,
+            fold_marker,
+        )
 
-    if highlight_lines_ranges is not None:
-        highlight_lines_code = "".join(
-            '<div class="highlight-line">&nbsp;</div>'
-            if is_highlight_line(idx + 1, highlight_lines_ranges)
-            else "<br/>"
-            for idx, _ in enumerate(lines)
+    if result is None:
+        code: str = (
+            options["highlight"](code=token.content, lang=language["name"])
+            if options["highlight"]
+            else escapeHtml(token.content)
         )
+        result = code if code.startswith("<pre") else f'<pre class="{language_class}"><code>{code}</code></pre>'
+        # 高亮结果的末尾空白已被去除，行数以原始代码为准
+        line_count = len(lines)
+
+        if highlight_lines_ranges is not None:
+            highlighted = highlight_line_set(highlight_lines_ranges, line_count)
+            highlight_lines_code = "".join(
+                '<div class="highlight-line">&nbsp;</div>' if idx + 1 in highlighted else "<br/>"
+                for idx in range(line_count)
+            )
 
-        result = f'{result}<div class="highlight-lines">{highlight_lines_code}</div>'
+            result = f'{result}<div class="highlight-lines">{highlight_lines_code}</div>'
 
-    if use_line_numbers := not bool(re.search(":no-line-numbers\b", info)):
-        line_numbers_code = "".join(['<div class="line-number"></div>'] * (len(lines) + 1))
-        result = f'{result}<div class="line-numbers" aria-hidden="true">{line_numbers_code}</div>'
+        if use_line_numbers:
+            line_numbers_code = "".join(['<div class="line-number"></div>'] * line_count)
+            result = f'{result}<div class="line-numbers" aria-hidden="true">{line_numbers_code}</div>'
 
     result = (
         f'<div class="{language_class} ext-{language["ext"]}'
@@ -74,5 +109,111 @@ def fence(md: RendererHTML, tokens: List[Token], idx: int, options: OptionsDict,
     return result
 
 
-def code_plugin(md: MarkdownIt):
-    md.add_render_rule("fence", fence)
+def _compact(
+    lines: list[str],
+    lang: str,
+    language_class: str,
+    options: OptionsDict,
+    highlight_lines_ranges: HighlightLinesRange | None,
+    use_line_numbers: bool,
+    max_lines: int | None,
+    tail_lines: int,
+    fold_marker: str,
+) -> str | None:
+    """以固定数量的元素绘制行号与高亮行，必要时折叠超出 `max_lines` 的行
+
+    行号是同一个元素中以换行分隔的文本，高亮行是一个元素的背景渐变，因此 DOM 节点数与行数无关.
+    """
+    total = len(lines)
+    text = "\n".join(lines) + "\n"
+    code: str = options["highlight"](code=text, lang=lang) if options["highlight"] else escapeHtml(text)
+    if code.startswith("<pre"):
+        # 自定义 Formatter 输出了完整的 <pre>，无法拼接，退回逐行的结构
+        return None
+    code = code.rstrip("\n")
+
+    # 每一显示行对应的原始行号，None 为折叠标记所在的行
+    rows: list[int | None] = list(range(1, total + 1))
+    if max_lines is not None and total > max_lines:
+        tail = min(tail_lines, max_lines)
+        head = max_lines - tail
+        # 整体高亮后再按行切分，使末尾的行与完整高亮时的词法状态一致（如位于多行字符串中）
+        code_lines = code.split("\n")
+        if len(code_lines) > total:
+            return None
+        code_lines += [""] * (total - len(code_lines))
+        head_code = "\n".join(code_lines[:head])
+        tail_code = "\n".join(code_lines[total - tail :])
+        if not (_balanced(head_code) and _balanced(tail_code)):
+            # 高亮结果中的元素跨越了行，切分后无法闭合
+            return None
+        marker = f'<span class="code-fold">{escapeHtml(fold_marker.format(count=total - max_lines))}</span>'
+        code = "\n".join([*code_lines[:head], marker, *code_lines[total - tail :]])
+        rows = [*range(1, head + 1), None, *range(total - tail + 1, total + 1)]
+    result = f'<pre class="{language_class}"><code>{code}</code></pre>'
+
+    if highlight_lines_ranges is not None:
+        highlighted = highlight_line_set(highlight_lines_ranges, total)
+        stops = []
+        row = 0
+        while row < len(rows):
+            if rows[row] not in highlighted:
+                row += 1
+                continue
+            end = row
+            while end + 1 < len(rows) and rows[end + 1] in highlighted:
+                end += 1
+            stops.append(
+                f"transparent 0 calc(1.25rem + {row} * 1.3rem),"
+                f"var(--code-hl-bg-color) 0 calc(1.25rem + {end + 1} * 1.3rem)"
+            )
+            row = end + 1
+        if stops:
+            gradient = f'linear-gradient({",".join(stops)},transparent 0)'
+            result = f'{result}<div class="highlight-lines compact" style="background-image:{gradient}"></div>'
+
+    if use_line_numbers:
+        line_numbers = "\n".join("" if i is None else str(i) for i in rows)
+        result = f'{result}<div class="line-numbers compact" aria-hidden="true">{line_numbers}</div>'
+
+    return result
+
+
+def _balanced(code: str) -> bool:
+    """检查按行切分出的高亮片段中的 span 是否均已闭合"""
+    return code.count("<span") == code.count("</span>")
+
+
+def code_plugin(
+    md: MarkdownIt,
+    *,
+    compact_lines: int | None = None,
+    max_lines: int | None = None,
+    tail_lines: int = 0,
+    fold_marker: str = "… {count} more lines",
+):
+    """代码块插件
+
+    Args:
+        md (MarkdownIt): MarkdownIt 实例
+        compact_lines (Optional[int], optional): 超过该行数的代码块使用紧凑结构，行号与高亮行只占用固定数量的元素，
+            而不是每行一个元素. 为 None 时不使用. 默认为 None.
+        max_lines (Optional[int], optional): 代码块最多显示的行数，超出的行将被折叠为一行标记. 为 None 时不折叠.
+        tail_lines (int, optional): 折叠时在标记之后保留的末尾行数，其余保留开头的行. 默认为 0.
+        fold_marker (str, optional): 折叠标记的文本，`{count}` 会被替换为折叠的行数. 默认为 `… {count} more lines`.
+    """
+
+    def render(self, tokens, idx, options, env):
+        return fence(
+            self,
+            tokens,
+            idx,
+            options,
+            env,
+            compact_lines=compact_lines,
+            max_lines=max_lines,
+            tail_lines=tail_lines,
+            fold_marker=fold_marker,
+        )
+
+    md.add_render_rule("fence", render)
@@ -24,18 +24,31 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+from __future__ import annotations
+
 import re
-from typing import List, Optional
 
-HighlightLinesRange = List[List[int]]
+HighlightLinesRange = list[list[int]]
 
 
-def resolve_highlight_lines(info: str) -> Optional[HighlightLinesRange]:
-    if re.match(r"{([\d,-]+)}", info) is None or not info.strip():
+def resolve_highlight_lines(info: str) -> HighlightLinesRange | None:
+    # 与 VuePress 相同，`{...}` 可以出现在 info 中的任意位置，如 `ts {2,4-5}`
+    match = re.search(r"{([\d,-]+)}", info)
+    if match is None:
         return
-    return list(map(lambda i: list(map(lambda j: int(j), i.split("-"))), info[1:-1].split(",")))
+    ranges = []
+    for item in match.group(1).split(","):
+        bounds = [int(i) for i in item.split("-") if i]
+        if bounds:
+            ranges.append([bounds[0], bounds[-1]])
+    return ranges
 
 
 # Check if a line number is in ranges
 def is_highlight_line(line_number: int, ranges: HighlightLinesRange) -> bool:
     return any(line_number >= range[0] and line_number <= range[1] for range in ranges)
+
+
+def highlight_line_set(ranges: HighlightLinesRange, last: int) -> set[int]:
+    """将高亮范围展开为不超过 `last` 的行号的集合，用于逐行判断"""
+    return {line for start, end in ranges for line in range(max(start, 1), min(end, last) + 1)}
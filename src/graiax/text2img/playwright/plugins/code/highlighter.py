@@ -1,27 +1,120 @@
+from __future__ import annotations
+
 import re
-from typing import Optional, Type
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
 
 from pygments import highlight as pgm_highlight
 from pygments import lexers
 from pygments.formatter import Formatter
 from pygments.formatters import HtmlFormatter
+from pygments.lexer import Lexer
 from pygments.styles import get_style_by_name
 
 
+@dataclass
+class HighlightStats:
+    """代码高亮缓存统计信息"""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
 class Highlighter:
-    def __init__(self, *, theme: str = "one-dark", formatter: Optional[Type[Formatter]] = None, **formatter_params):
+    """代码高亮器
+
+    Args:
+        theme (str, optional): Pygments 主题名. 默认为 `one-dark`.
+        formatter (Optional[Type[Formatter]], optional): Pygments Formatter 类型.
+            默认使用不输出外层 `<div class="highlight"><pre>` 的 `HtmlFormatter`，直接生成代码块所需的片段.
+        cache_size (int, optional): 高亮结果缓存的最大条目数，为 0 时不缓存. 默认为 256.
+        cache_max_chars (int, optional): 高亮结果缓存中代码与结果的最大总字符数. 默认为 4 * 1024 * 1024.
+        **formatter_params: 传递给 Formatter 的参数.
+    """
+
+    stats: HighlightStats
+
+    def __init__(
+        self,
+        *,
+        theme: str = "one-dark",
+        formatter: type[Formatter] | None = None,
+        cache_size: int = 256,
+        cache_max_chars: int = 4 * 1024 * 1024,
+        **formatter_params,
+    ):
         if formatter is None:
+            formatter_params.setdefault("nowrap", True)
             self.formatter = HtmlFormatter(style=get_style_by_name(theme), **formatter_params)
         else:
             self.formatter = formatter(**formatter_params)
+        # nowrap 时 Formatter 直接输出各个 token 的 span，无需再用正则去除外层包裹
+        self._direct = isinstance(self.formatter, HtmlFormatter) and bool(self.formatter.nowrap)
+        self.cache_size = cache_size
+        self.cache_max_chars = cache_max_chars
+        self.stats = HighlightStats()
+        self._lexers: dict[str, Lexer | None] = {}
+        self._cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._cache_chars = 0
+        self._lock = Lock()
 
-    def __call__(self, code: str, lang: str) -> str:
+    def get_lexer(self, lang: str) -> Lexer | None:
+        """获取并缓存语言对应的 Lexer 实例，不支持的语言返回 None"""
+        try:
+            return self._lexers[lang]
+        except KeyError:
+            pass
         try:
             lexer = lexers.get_lexer_by_name(lang)
         except ValueError:
+            lexer = None
+        self._lexers[lang] = lexer
+        return lexer
+
+    def __call__(self, code: str, lang: str) -> str:
+        lexer = self.get_lexer(lang)
+        if lexer is None:
             return code
 
+        key = (lang, code)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats.hits += 1
+                return cached
+            self.stats.misses += 1
+
+        result = self._highlight(code, lexer)
+        self._remember(key, result)
+        return result
+
+    def _highlight(self, code: str, lexer: Lexer) -> str:
+        if self._direct:
+            return pgm_highlight(code, lexer, self.formatter).rstrip()
         result = pgm_highlight(code, lexer, self.formatter).strip()
         # remove the previous '<div class="highlight"><pre>' and the last '</pre></div>'
         re_result = re.search(r'^<div class="highlight"><pre>([.\s\S]*)</pre></div>$', result)
         return re_result.groups()[0].strip() if re_result is not None else result
+
+    def _remember(self, key: tuple[str, str], result: str) -> None:
+        size = len(key[1]) + len(result)
+        if self.cache_size <= 0 or size > self.cache_max_chars:
+            return
+        with self._lock:
+            if key in self._cache:
+                return
+            self._cache[key] = result
+            self._cache_chars += size
+            while len(self._cache) > self.cache_size or self._cache_chars > self.cache_max_chars:
+                (_, code), evicted = self._cache.popitem(last=False)
+                self._cache_chars -= len(code) + len(evicted)
+                self.stats.evictions += 1
+
+    def clear_cache(self) -> None:
+        """清空高亮结果缓存"""
+        with self._lock:
+            self._cache.clear()
+            self._cache_chars = 0
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+from collections.abc import Iterable
 from dataclasses import dataclass
-from typing import List, Optional, Union
 
 from markdown_it import MarkdownIt
+from markdown_it.rules_block import StateBlock
 from markdown_it.token import Token
 from mdit_py_plugins.container.index import container_plugin
+from mdit_py_plugins.utils import is_code_block
 
 from ..utils import MdPluginBase
 
@@ -59,12 +61,12 @@ class Container(MdPluginBase):
     title: str
     style: str
 
-    def __init__(self, style: Union[ContainerColor, str], name: str, title: Optional[str] = None) -> None:
+    def __init__(self, style: ContainerColor | str, name: str, title: str | None = None) -> None:
         self.name = name
         self.title = title or name
         self.style = style.to_style() if isinstance(style, ContainerColor) else style
 
-    def render_impl(self, tokens: List[Token], idx: int):
+    def render_impl(self, tokens: list[Token], idx: int):
         token: Token = tokens[idx]
         info = token.info.strip()[len(self.name) :].strip()
 
@@ -86,6 +88,143 @@ class Container(MdPluginBase):
         container_plugin(md, self.name, validate=self.validate, render=render)
 
 
+class ContainerGroup(MdPluginBase):
+    """自定义容器组
+
+    将多个 `Container` 注册为同一条块规则. 遇到容器标记时按容器名查表选择容器，
+    因此每一行的解析开销不会随容器数量增加. 渲染结果与逐个应用各个 `Container` 相同.
+
+    用法:
+        ```python
+        converter = MarkdownConverter(extra_plugins=(ContainerGroup([TIP, WARNING, DANGER, *my_containers]),))
+        ```
+
+    Args:
+        containers (Iterable[Container]): 要注册的容器，名字不能重复.
+        marker (str, optional): 容器标记使用的字符，必须为单个字符. 默认为 `:`.
+    """
+
+    containers: dict[str, Container]
+    marker: str
+
+    def __init__(self, containers: Iterable[Container], marker: str = ":") -> None:
+        if len(marker) != 1:
+            raise ValueError("`marker` must be a single character.")
+        self.containers = {}
+        for container in containers:
+            if container.name in self.containers:
+                raise ValueError(f"Duplicate container name: {container.name!r}.")
+            self.containers[container.name] = container
+        self.marker = marker
+
+    def match(self, params: str, markup: str) -> Container | None:
+        """根据标记后的参数选择容器
+
+        优先选择名字与参数的第一个词相同的容器，否则与逐个应用时相同，选择第一个 `validate` 通过的容器.
+
+        Args:
+            params (str): 容器标记之后的内容
+            markup (str): 容器标记
+
+        Returns:
+            Optional[Container]: 选中的容器，没有匹配的容器时为 None
+        """
+        words = params.split(maxsplit=1)
+        container = self.containers.get(words[0]) if words else None
+        if container is not None and container.validate(params, markup):
+            return container
+        # 如 `:::tip标题` 这样名字后没有空格的写法
+        for container in self.containers.values():
+            if container.validate(params, markup):
+                return container
+        return None
+
+    def apply(self, md: MarkdownIt):
+        marker_char = self.marker
+
+        def container_func(state: StateBlock, start_line: int, end_line: int, silent: bool) -> bool:
+            # 与 mdit_py_plugins 的 container_plugin 相同，只是在找到标记后才查表确定是哪个容器
+            if is_code_block(state, start_line):
+                return False
+            start = state.bMarks[start_line] + state.tShift[start_line]
+            maximum = state.eMarks[start_line]
+            if start >= maximum or state.src[start] != marker_char:
+                return False
+
+            pos = start + 1
+            while pos < maximum and state.src[pos] == marker_char:
+                pos += 1
+            marker_count = pos - start
+            if marker_count < 3:
+                return False
+
+            markup = state.src[start:pos]
+            params = state.src[pos:maximum]
+            container = self.match(params, markup)
+            if container is None:
+                return False
+            if silent:
+                return True
+
+            auto_closed = False
+            next_line = start_line
+            while True:
+                next_line += 1
+                if next_line >= end_line:
+                    # 未闭合的容器在文档或父级块结束处自动闭合
+                    break
+                start = state.bMarks[next_line] + state.tShift[next_line]
+                maximum = state.eMarks[next_line]
+                if start < maximum and state.sCount[next_line] < state.blkIndent:
+                    break
+                if start >= maximum or state.src[start] != marker_char or is_code_block(state, next_line):
+                    continue
+                pos = start + 1
+                while pos < maximum and state.src[pos] == marker_char:
+                    pos += 1
+                # 结束标记不能比开始标记短，且其后只能有空白
+                if pos - start < marker_count or state.skipSpaces(pos) < maximum:
+                    continue
+                auto_closed = True
+                break
+
+            old_parent = state.parentType
+            old_line_max = state.lineMax
+            state.parentType = "container"
+            state.lineMax = next_line
+
+            token = state.push(f"container_{container.name}_open", "div", 1)
+            token.markup = markup
+            token.block = True
+            token.info = params
+            token.map = [start_line, next_line]
+
+            state.md.block.tokenize(state, start_line + 1, next_line)
+
+            token = state.push(f"container_{container.name}_close", "div", -1)
+            token.markup = state.src[start:pos]
+            token.block = True
+
+            state.parentType = old_parent
+            state.lineMax = old_line_max
+            state.line = next_line + (1 if auto_closed else 0)
+            return True
+
+        md.block.ruler.before(
+            "fence",
+            "container_group",
+            container_func,
+            {"alt": ["paragraph", "reference", "blockquote", "list"]},
+        )
+        for container in self.containers.values():
+
+            def render(_, tokens, idx, *__, container=container):
+                return container.render_impl(tokens, idx)
+
+            md.add_render_rule(f"container_{container.name}_open", render)
+            md.add_render_rule(f"container_{container.name}_close", render)
+
+
 WARNING = Container(ContainerColor("#ad850e", "rgba(255, 197, 23, .5)", "rgba(255, 197, 23, .05)"), "warning", "注意")
 TIP = Container(ContainerColor("#155f3e", "rgba(66, 184, 131, .5)", "rgba(66, 184, 131, .05)"), "tip", "提示")
 DANGER = Container(ContainerColor("#ab2131", "rgba(237, 60, 80, .5)", "rgba(237, 60, 80, .05)"), "danger", "警告")
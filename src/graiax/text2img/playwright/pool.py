@@ -0,0 +1,459 @@
+"""页面池
+
+为 `HTMLRenderer` 复用预先创建并配置好的 Page，避免每次渲染都创建、销毁页面.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Awaitable, Callable, Hashable
+from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from loguru import logger
+from playwright.async_api import BrowserContext, Page
+
+from .utils import run_always_await
+
+PageModifier = Callable[[Page], Awaitable[None] | None]
+
+# Chromium 上页面的 JS 堆已用大小，其他浏览器不支持时为 null
+_HEAP_JS = "() => performance.memory ? performance.memory.usedJSHeapSize : null"
+
+# 后台检查闲置页面的最长间隔（秒）
+_EVICT_INTERVAL = 30.0
+
+
+class _SlotClosed(Exception):
+    """等待或创建页面期间分组已被关闭，应在新的分组中重试"""
+
+
+def freeze(obj: Any) -> Hashable:
+    """将 dict/list 等嵌套结构转换为可哈希的形式，用作池的键"""
+    if isinstance(obj, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in obj.items()))
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return tuple(freeze(i) for i in obj)
+    try:
+        hash(obj)
+    except TypeError:
+        return repr(obj)
+    return obj
+
+
+@dataclass(eq=False)
+class _Generation:
+    """分组中的一代浏览器上下文，回收后不再在其中创建页面，其页面全部关闭后退出该上下文"""
+
+    stack: AsyncExitStack = field(default_factory=AsyncExitStack)
+    context: BrowserContext | None = None
+    pages: int = 0
+    uses: int = 0
+    created: float = field(default_factory=time.monotonic)
+    retired: bool = False
+
+
+@dataclass(eq=False)
+class PooledPage:
+    page: Page
+    generation: _Generation
+    uses: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+@dataclass(eq=False)
+class _Slot:
+    context_factory: Callable[[], AbstractAsyncContextManager[BrowserContext]]
+    modifiers: tuple[PageModifier, ...]
+    generation: _Generation | None = None
+    generations: list[_Generation] = field(default_factory=list)
+    idle: list[PooledPage] = field(default_factory=list)
+    busy: int = 0
+    closed: bool = False
+    last_used: float = field(default_factory=time.monotonic)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    cond: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+    @property
+    def total(self) -> int:
+        return len(self.idle) + self.busy
+
+
+@dataclass
+class PoolStats:
+    """页面池统计信息"""
+
+    created: int = 0
+    reused: int = 0
+    discarded: int = 0
+    evicted: int = 0
+    recycled_contexts: int = 0
+    heap_exceeded: int = 0
+
+
+class PagePool:
+    """页面池
+
+    按照 (页面来源, page_option, page_modifiers) 分组保存预先创建好的 Page，
+    每次渲染时取出一个页面，渲染完成后归还.
+
+    Args:
+        size (int, optional): 每个分组最多同时存在的页面数，达到上限后的渲染会等待页面归还. 默认为 4.
+        preload (int, optional): 分组首次使用时预先创建的页面数. 默认为 1.
+        max_uses (int, optional): 单个页面最多被使用的次数，超过后将被关闭并重新创建. 默认为 200.
+        idle_timeout (float, optional): 页面闲置超过该秒数后将被关闭，整个分组闲置超时后其上下文也会被关闭.
+            池在使用期间会在后台定期检查，没有渲染时也会释放闲置的页面. 默认为 300 秒.
+        max_groups (int, optional): 最多保留的分组数，超出时关闭最久未使用的闲置分组. 默认为 8.
+        health_check (bool, optional): 取出页面时是否通过执行一段 JS 检查其是否可用. 默认为 True.
+        max_context_uses (Optional[int], optional): 每个上下文最多进行的渲染数，超过后回收该上下文. 默认为 None，不限制.
+        max_context_age (Optional[float], optional): 上下文最长的存活秒数，超过后回收该上下文. 默认为 None，不限制.
+        max_heap_bytes (Optional[int], optional): 页面 JS 堆已用大小的上限（字节），超过后关闭该页面.
+            通过 `performance.memory` 测量，仅在 Chromium 上有效. 默认为 None，不限制.
+        heap_check_interval (int, optional): 页面每使用多少次测量一次 JS 堆. 默认为 20.
+
+    回收上下文时，之后的渲染会在新的上下文中创建页面；正在进行的渲染不受影响，旧上下文在其页面全部归还后才关闭.
+    对于不由池创建的上下文（如传入的 `context` 或持久上下文），回收时仅重新创建其中的页面.
+    """
+
+    size: int
+    preload: int
+    max_uses: int
+    idle_timeout: float
+    max_groups: int
+    health_check: bool
+    max_context_uses: int | None
+    max_context_age: float | None
+    max_heap_bytes: int | None
+    heap_check_interval: int
+    stats: PoolStats
+
+    def __init__(
+        self,
+        size: int = 4,
+        *,
+        preload: int = 1,
+        max_uses: int = 200,
+        idle_timeout: float = 300.0,
+        max_groups: int = 8,
+        health_check: bool = True,
+        max_context_uses: int | None = None,
+        max_context_age: float | None = None,
+        max_heap_bytes: int | None = None,
+        heap_check_interval: int = 20,
+    ) -> None:
+        if size < 1:
+            raise ValueError("`size` must be at least 1.")
+        self.size = size
+        self.preload = min(max(preload, 0), size)
+        self.max_uses = max_uses
+        self.idle_timeout = idle_timeout
+        self.max_groups = max_groups
+        self.health_check = health_check
+        self.max_context_uses = max_context_uses
+        self.max_context_age = max_context_age
+        self.max_heap_bytes = max_heap_bytes
+        self.heap_check_interval = max(heap_check_interval, 1)
+        self.stats = PoolStats()
+        self._slots: OrderedDict[Hashable, _Slot] = OrderedDict()
+        self._evictor: asyncio.Task[None] | None = None
+
+    @property
+    def recycles_contexts(self) -> bool:
+        """是否按渲染数或存活时间回收上下文"""
+        return self.max_context_uses is not None or self.max_context_age is not None
+
+    @asynccontextmanager
+    async def page(
+        self,
+        key: Hashable,
+        context_factory: Callable[[], AbstractAsyncContextManager[BrowserContext]],
+        modifiers: tuple[PageModifier, ...] = (),
+    ) -> AsyncGenerator[Page, None]:
+        """从池中取出一个页面，退出时自动归还
+
+        渲染过程中抛出异常的页面不会被归还，而是直接关闭.
+
+        Args:
+            key (Hashable): 分组的键，相同键的页面可以互相替代.
+            context_factory (Callable[[], AbstractAsyncContextManager[BrowserContext]]):
+                分组首次使用时用于获取浏览器上下文的函数，分组关闭时退出该上下文管理器.
+            modifiers (tuple[PageModifier, ...], optional): 页面创建时执行一次的 page_modifiers.
+        """
+        slot, pooled = await self.acquire(key, context_factory, modifiers)
+        try:
+            yield pooled.page
+        except BaseException:
+            await self.release(slot, pooled, discard=True)
+            raise
+        else:
+            await self.release(slot, pooled)
+
+    async def acquire(
+        self,
+        key: Hashable,
+        context_factory: Callable[[], AbstractAsyncContextManager[BrowserContext]],
+        modifiers: tuple[PageModifier, ...] = (),
+    ) -> tuple[_Slot, PooledPage]:
+        while True:
+            await self.evict_idle()
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = _Slot(context_factory, modifiers)
+                self._slots[key] = slot
+                self._start_evictor()
+                await self._trim_groups(keep=key)
+                if slot.closed:
+                    continue
+            self._slots.move_to_end(key)
+            slot.last_used = time.monotonic()
+
+            async with slot.cond:
+                while not slot.closed and not slot.idle and slot.total >= self.size:
+                    await slot.cond.wait()
+                if slot.closed:
+                    # 等待期间分组被关闭，在新的分组中重试
+                    continue
+                slot.busy += 1
+
+            try:
+                return slot, await self._take(slot)
+            except _SlotClosed:
+                await self._give_back(slot)
+            except BaseException:
+                await self._give_back(slot)
+                raise
+
+    async def _take(self, slot: _Slot) -> PooledPage:
+        if slot.generation is not None and self._expired(slot.generation):
+            await self._retire(slot, slot.generation)
+        while slot.idle:
+            pooled = slot.idle.pop()
+            healthy = await self._healthy(pooled.page)
+            if healthy and not slot.closed:
+                self.stats.reused += 1
+                return pooled
+            if healthy:
+                # 检查期间分组被关闭，该页面已不属于任何分组
+                await self._close_pooled(slot, pooled)
+                raise _SlotClosed
+            self.stats.discarded += 1
+            await self._close_pooled(slot, pooled)
+        if slot.closed:
+            raise _SlotClosed
+        return await self._create_many(slot)
+
+    async def release(self, slot: _Slot, pooled: PooledPage, *, discard: bool = False) -> None:
+        pooled.uses += 1
+        pooled.last_used = slot.last_used = time.monotonic()
+        generation = pooled.generation
+        generation.uses += 1
+        try:
+            if not generation.retired and self._expired(generation):
+                await self._retire(slot, generation)
+            if not discard and not generation.retired and await self._heap_exceeded(pooled):
+                self.stats.heap_exceeded += 1
+                discard = True
+            if discard or pooled.uses >= self.max_uses or pooled.page.is_closed() or slot.closed or generation.retired:
+                self.stats.discarded += 1
+                await self._close_pooled(slot, pooled)
+            else:
+                slot.idle.append(pooled)
+        finally:
+            await self._give_back(slot)
+
+    async def evict_idle(self) -> None:
+        """关闭闲置超时的页面与分组"""
+        deadline = time.monotonic() - self.idle_timeout
+        for key, slot in list(self._slots.items()):
+            if slot.busy == 0 and slot.last_used < deadline:
+                self.stats.evicted += len(slot.idle)
+                del self._slots[key]
+                await self._close_slot(slot)
+                continue
+            expired = [i for i in slot.idle if i.last_used < deadline]
+            for pooled in expired:
+                slot.idle.remove(pooled)
+                self.stats.evicted += 1
+                await self._close_pooled(slot, pooled)
+
+    async def close_groups(self, predicate: Callable[[Hashable], bool]) -> None:
+        """关闭键满足 `predicate` 的分组，借出的页面在归还时关闭
+
+        Args:
+            predicate (Callable[[Hashable], bool]): 接受分组的键，返回是否关闭该分组
+        """
+        for key in [i for i in self._slots if predicate(i)]:
+            slot = self._slots.pop(key)
+            self.stats.evicted += len(slot.idle)
+            await self._close_slot(slot)
+
+    async def close(self) -> None:
+        """关闭池中的所有页面与由池创建的上下文"""
+        if self._evictor is not None:
+            self._evictor.cancel()
+            self._evictor = None
+        slots = list(self._slots.values())
+        self._slots.clear()
+        for slot in slots:
+            await self._close_slot(slot)
+
+    def _start_evictor(self) -> None:
+        if self._evictor is None or self._evictor.done():
+            self._evictor = asyncio.get_running_loop().create_task(self._evict_periodically())
+
+    async def _evict_periodically(self) -> None:
+        interval = min(self.idle_timeout, _EVICT_INTERVAL)
+        # 池中没有分组后退出，下次取出页面时重新启动
+        while self._slots:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict_idle()
+            except Exception:
+                logger.exception("Failed to evict idle pages")
+
+    async def _give_back(self, slot: _Slot) -> None:
+        async with slot.cond:
+            slot.busy -= 1
+            slot.cond.notify()
+
+    async def _trim_groups(self, keep: Hashable) -> None:
+        for key in list(self._slots):
+            if len(self._slots) <= self.max_groups:
+                return
+            slot = self._slots[key]
+            if key != keep and slot.busy == 0:
+                del self._slots[key]
+                self.stats.evicted += len(slot.idle)
+                await self._close_slot(slot)
+
+    async def _healthy(self, page: Page) -> bool:
+        if page.is_closed():
+            return False
+        if not self.health_check:
+            return True
+        try:
+            return await page.evaluate("1") == 1
+        except Exception:
+            return False
+
+    def _expired(self, generation: _Generation) -> bool:
+        if self.max_context_uses is not None and generation.uses >= self.max_context_uses:
+            return True
+        return self.max_context_age is not None and time.monotonic() - generation.created >= self.max_context_age
+
+    async def _retire(self, slot: _Slot, generation: _Generation) -> None:
+        """回收一代上下文：关闭其闲置的页面，借出的页面在归还时关闭"""
+        generation.retired = True
+        self.stats.recycled_contexts += 1
+        if slot.generation is generation:
+            slot.generation = None
+        retired = [i for i in slot.idle if i.generation is generation]
+        slot.idle = [i for i in slot.idle if i.generation is not generation]
+        for pooled in retired:
+            self.stats.discarded += 1
+            await self._close_pooled(slot, pooled)
+        if generation.pages == 0:
+            await self._close_generation(slot, generation)
+
+    async def _heap_exceeded(self, pooled: PooledPage) -> bool:
+        if self.max_heap_bytes is None or pooled.uses % self.heap_check_interval or pooled.page.is_closed():
+            return False
+        try:
+            used = await pooled.page.evaluate(_HEAP_JS)
+        except Exception:
+            return False
+        return used is not None and used > self.max_heap_bytes
+
+    async def _create(self, slot: _Slot) -> PooledPage:
+        async with slot.lock:
+            if slot.closed:
+                raise _SlotClosed
+            generation = slot.generation
+            if generation is None:
+                generation = _Generation()
+                generation.context = await generation.stack.enter_async_context(slot.context_factory())
+                if slot.closed:
+                    # 创建上下文期间分组被关闭，关闭分组时还不知道这个上下文
+                    await generation.stack.aclose()
+                    raise _SlotClosed
+                slot.generation = generation
+                slot.generations.append(generation)
+        assert generation.context is not None
+        generation.pages += 1
+        try:
+            page = await generation.context.new_page()
+            for modifier in slot.modifiers:
+                await run_always_await(modifier, page)
+        except BaseException as e:
+            generation.pages -= 1
+            if slot.closed and isinstance(e, Exception):
+                raise _SlotClosed from None
+            raise
+        pooled = PooledPage(page, generation)
+        if slot.closed:
+            await self._close_pooled(slot, pooled)
+            raise _SlotClosed
+        self.stats.created += 1
+        return pooled
+
+    async def _create_many(self, slot: _Slot) -> PooledPage:
+        # 补足 preload 个页面，额外创建的页面先计入 busy 以免并发时超出 size
+        extra = max(self.preload - slot.total, 0)
+        slot.busy += extra
+        try:
+            results = await asyncio.gather(*(self._create(slot) for _ in range(1 + extra)), return_exceptions=True)
+        finally:
+            slot.busy -= extra
+        pages = [i for i in results if isinstance(i, PooledPage)]
+        if slot.closed:
+            for pooled in pages:
+                await self._close_pooled(slot, pooled)
+            raise _SlotClosed
+        if not pages:
+            raise next(i for i in results if isinstance(i, BaseException))
+        if len(pages) > 1:
+            async with slot.cond:
+                slot.idle.extend(pages[1:])
+                slot.cond.notify(len(pages) - 1)
+        return pages[0]
+
+    async def _close_slot(self, slot: _Slot) -> None:
+        slot.closed = True
+        # 唤醒等待该分组的 acquire，使其在新的分组中重试
+        async with slot.cond:
+            slot.cond.notify_all()
+        for pooled in slot.idle:
+            await self._close_page(pooled.page)
+        slot.idle.clear()
+        slot.generation = None
+        for generation in list(slot.generations):
+            await self._close_generation(slot, generation)
+
+    async def _close_pooled(self, slot: _Slot, pooled: PooledPage) -> None:
+        await self._close_page(pooled.page)
+        generation = pooled.generation
+        generation.pages -= 1
+        if generation.retired and generation.pages == 0:
+            await self._close_generation(slot, generation)
+
+    @staticmethod
+    async def _close_generation(slot: _Slot, generation: _Generation) -> None:
+        if generation not in slot.generations:
+            return
+        slot.generations.remove(generation)
+        try:
+            await generation.stack.aclose()
+        except Exception:
+            pass
+
+    @staticmethod
+    async def _close_page(page: Page) -> None:
+        if page.is_closed():
+            return
+        try:
+            await page.close()
+        except Exception:
+            pass
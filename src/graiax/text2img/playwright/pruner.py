@@ -0,0 +1,208 @@
+"""CSS 裁剪
+
+根据 HTML 中实际出现的标签、class 与 id，去除样式表中不可能匹配的规则.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+
+_TAG_RE = re.compile(r"<([a-zA-Z][\w-]*)")
+_CLASS_RE = re.compile(r"""\sclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))""")
+_ID_RE = re.compile(r"""\sid\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))""")
+
+_SEL_STRIP_RE = re.compile(r"""\[[^\]]*\]|"[^"]*"|'[^']*'|::?[\w-]+""")
+_SEL_CLASS_RE = re.compile(r"\.([\w-]+)")
+_SEL_ID_RE = re.compile(r"#([\w-]+)")
+_SEL_TAG_RE = re.compile(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)")
+
+# 即使 HTML 中没有写出，浏览器也总会生成的元素
+_ALWAYS_TAGS = frozenset({"html", "head", "body", "meta", "style"})
+_IMPLIED_TAGS = {"table": "tbody"}
+
+
+@dataclass(frozen=True)
+class _Requirement:
+    tags: frozenset[str]
+    classes: frozenset[str]
+    ids: frozenset[str]
+
+
+@dataclass
+class _StyleRule:
+    text: str
+    requirements: list[_Requirement] | None  # None 表示无法判断，总是保留
+
+
+@dataclass
+class _BlockRule:
+    prelude: str
+    children: list[_Rule]
+
+
+_Rule = _StyleRule | _BlockRule
+Signature = tuple[frozenset[str], frozenset[str], frozenset[str]]
+
+
+def _strip_parens(selector: str) -> str | None:
+    # 去掉 :not(...)、:is(...) 等函数式伪类的参数，其中出现的 class 不要求存在于文档中
+    result, depth = [], 0
+    for char in selector:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                return None
+        elif depth == 0:
+            result.append(char)
+    return "".join(result) if depth == 0 else None
+
+
+def _parse_selector(selector: str) -> _Requirement | None:
+    if "\\" in selector:
+        return None
+    stripped = _strip_parens(selector)
+    if stripped is None:
+        return None
+    stripped = _SEL_STRIP_RE.sub(" ", stripped)
+    return _Requirement(
+        frozenset(i.lower() for i in _SEL_TAG_RE.findall(stripped)),
+        frozenset(_SEL_CLASS_RE.findall(stripped)),
+        frozenset(_SEL_ID_RE.findall(stripped)),
+    )
+
+
+def _split_selectors(prelude: str) -> list[str]:
+    result, depth, start = [], 0, 0
+    for idx, char in enumerate(prelude):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            result.append(prelude[start:idx])
+            start = idx + 1
+    result.append(prelude[start:])
+    return [i.strip() for i in result if i.strip()]
+
+
+def _skip_string(css: str, idx: int) -> int:
+    quote = css[idx]
+    idx += 1
+    while idx < len(css) and css[idx] != quote:
+        idx += 2 if css[idx] == "\\" else 1
+    return idx + 1
+
+
+def _find_block_end(css: str, idx: int) -> int:
+    """返回与 idx 处 `{` 配对的 `}` 之后的位置"""
+    depth = 0
+    while idx < len(css):
+        char = css[idx]
+        if char in "\"'":
+            idx = _skip_string(css, idx)
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return idx + 1
+        idx += 1
+    return idx
+
+
+def _parse(css: str) -> list[_Rule]:
+    css = re.sub(r"/\*[\s\S]*?\*/", "", css)
+    rules: list[_Rule] = []
+    idx = 0
+    while idx < len(css):
+        while idx < len(css) and css[idx].isspace():
+            idx += 1
+        if idx >= len(css):
+            break
+        start = idx
+        while idx < len(css) and css[idx] not in "{;":
+            idx = _skip_string(css, idx) if css[idx] in "\"'" else idx + 1
+        if idx >= len(css) or css[idx] == ";":
+            # @import、@charset 等语句，原样保留
+            rules.append(_StyleRule(css[start : idx + 1], None))
+            idx += 1
+            continue
+        prelude = css[start:idx].strip()
+        end = _find_block_end(css, idx)
+        if prelude.startswith(("@media", "@supports", "@layer", "@container")):
+            rules.append(_BlockRule(prelude, _parse(css[idx + 1 : end - 1])))
+        elif prelude.startswith("@"):
+            rules.append(_StyleRule(css[start:end], None))
+        else:
+            requirements = [_parse_selector(i) for i in _split_selectors(prelude)]
+            if any(i is None for i in requirements):
+                rules.append(_StyleRule(css[start:end], None))
+            else:
+                rules.append(_StyleRule(css[start:end], [i for i in requirements if i is not None]))
+        idx = end
+    return rules
+
+
+def document_signature(html: str) -> Signature:
+    """提取 HTML 中出现的标签、class 与 id"""
+    tags = {i.lower() for i in _TAG_RE.findall(html)} | _ALWAYS_TAGS
+    tags |= {implied for tag, implied in _IMPLIED_TAGS.items() if tag in tags}
+    classes = {c for m in _CLASS_RE.findall(html) for c in "".join(m).split()}
+    ids = {"".join(m) for m in _ID_RE.findall(html)}
+    return frozenset(tags), frozenset(classes), frozenset(ids)
+
+
+class CSSPruner:
+    """CSS 裁剪器
+
+    预先解析样式表，并为每个文档仅保留可能匹配其中标签、class 与 id 的规则.
+    裁剪结果按文档的标签/class/id 集合缓存.
+
+    该判断是保守的：含有属性选择器、伪类等无法静态判断的部分时仍会保留规则，
+    但通过 JS 在渲染后动态添加的元素与 class 不会被考虑.
+
+    Args:
+        style (str): 要裁剪的样式表
+        cache_size (int, optional): 最多缓存的裁剪结果数. 默认为 128.
+    """
+
+    style: str
+    cache_size: int
+
+    def __init__(self, style: str, cache_size: int = 128) -> None:
+        self.style = style
+        self.cache_size = cache_size
+        self._rules = _parse(style)
+        self._cache: OrderedDict[Signature, str] = OrderedDict()
+
+    def prune(self, html: str) -> str:
+        """返回仅包含可能匹配 `html` 的规则的样式表"""
+        signature = document_signature(html)
+        result = self._cache.get(signature)
+        if result is not None:
+            self._cache.move_to_end(signature)
+            return result
+        result = "\n".join(self._render(self._rules, signature))
+        self._cache[signature] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _render(self, rules: list[_Rule], signature: Signature) -> list[str]:
+        tags, classes, ids = signature
+        result = []
+        for rule in rules:
+            if isinstance(rule, _BlockRule):
+                children = "\n".join(self._render(rule.children, signature))
+                if children:
+                    result.append(f"{rule.prelude} {{\n{children}\n}}")
+            elif rule.requirements is None or any(
+                i.tags <= tags and i.classes <= classes and i.ids <= ids for i in rule.requirements
+            ):
+                result.append(rule.text)
+        return result
@@ -0,0 +1,224 @@
+"""不经过浏览器的纯文本光栅化
+
+`convert_text` 生成的结构只有一列段落，无需启动浏览器也可以直接绘制为图片. 需要安装可选依赖 Pillow:
+`pip install graiax-text2img-playwright[raster]`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import re
+from collections.abc import Sequence
+from concurrent.futures import Executor
+from functools import partial
+from pathlib import Path
+from typing import Literal
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError as e:
+    raise ImportError(
+        "TextRasterizer requires Pillow, install it with `pip install graiax-text2img-playwright[raster]`."
+    ) from e
+
+# 按顺序查找的本地字体，优先使用包含中文字形的字体. Pillow 会在系统字体目录中查找这些文件名
+_FONT_CANDIDATES = (
+    "msyh.ttc",
+    "PingFang.ttc",
+    "NotoSansCJK-Regular.ttc",
+    "NotoSansCJKsc-Regular.otf",
+    "SourceHanSansSC-Regular.otf",
+    "wqy-microhei.ttc",
+    "wqy-zenhei.ttc",
+    "Arial Unicode.ttf",
+    "DejaVuSans.ttf",
+    "arial.ttf",
+)
+
+# 与 reset.css 中随视口宽度变化的 body 内边距一致: (最小宽度, (上下, 左右))
+_PADDINGS = ((1280, (85, 70)), (800, (60, 50)), (500, (45, 40)), (0, (25, 20)))
+
+# 中日韩字符之间可以任意断行，其余文本按单词断行
+_CJK = "⺀-鿿가-힯豈-﫿＀-￯"
+_TOKEN = re.compile(rf"[{_CJK}]|[^\s{_CJK}]+\s*|\s+")
+
+
+class TextRasterizer:
+    """纯文本光栅化器
+
+    将与 `convert_text` 相同的内容（按行分段的纯文本）直接绘制为图片，不经过浏览器.
+    默认的尺寸、内边距、段落间距与颜色与使用默认 CSS 的 `HTMLRenderer` 渲染 `convert_text` 的结果一致，
+    但字体取决于本地可用的字体. 与浏览器相同，空行不占据高度；文本中的 HTML 不会被解析.
+
+    用法:
+        ```python
+        rasterizer = TextRasterizer(width=840, scale=1.5)
+        image = await rasterizer.arender("第一行\\n第二行")
+        ```
+
+    Args:
+        width (int, optional): 图片宽度（CSS 像素），对应页面的视口宽度. 默认为 840.
+        font (Optional[Union[str, Path, Sequence[Union[str, Path]]]], optional): 字体文件的路径或文件名，
+            传入多个时使用第一个可以载入的. 默认按顺序查找常见的中文字体与 DejaVu Sans.
+        font_size (int, optional): 字号（CSS 像素）. 默认为 16.
+        line_height (Optional[float], optional): 行高与字号的比值，为 None 时使用字体自身的行高. 默认为 None.
+        paragraph_spacing (Optional[int], optional): 段落间距（CSS 像素），为 None 时与 `<p>` 的默认外边距相同，
+            等于字号. 默认为 None.
+        padding (Optional[tuple[int, int]], optional): 上下与左右的内边距（CSS 像素），为 None 时按 `width`
+            与 reset.css 相同地选择. 默认为 None.
+        color (str, optional): 文字颜色. 默认为 `#000000`.
+        background (str, optional): 背景颜色. 默认为 `#ffffff`.
+        scale (float, optional): 缩放比例，对应页面的 `device_scale_factor`. 默认为 1.
+        executor (Optional[Executor], optional): `arender` 使用的执行器，为 None 时使用事件循环默认的线程池.
+    """
+
+    width: int
+    font_size: int
+    line_height: float | None
+    paragraph_spacing: int
+    padding: tuple[int, int]
+    color: str
+    background: str
+    scale: float
+    executor: Executor | None
+
+    def __init__(
+        self,
+        *,
+        width: int = 840,
+        font: str | Path | Sequence[str | Path] | None = None,
+        font_size: int = 16,
+        line_height: float | None = None,
+        paragraph_spacing: int | None = None,
+        padding: tuple[int, int] | None = None,
+        color: str = "#000000",
+        background: str = "#ffffff",
+        scale: float = 1,
+        executor: Executor | None = None,
+    ) -> None:
+        self.width = width
+        self.font_size = font_size
+        self.line_height = line_height
+        self.paragraph_spacing = font_size if paragraph_spacing is None else paragraph_spacing
+        self.padding = padding or next(p for w, p in _PADDINGS if width >= w)
+        self.color = color
+        self.background = background
+        self.scale = scale
+        self.executor = executor
+        if font is None:
+            fonts: Sequence[str | Path] = _FONT_CANDIDATES
+        elif isinstance(font, (str, Path)):
+            fonts = [font]
+        else:
+            fonts = font
+        self.font = _load_font(fonts, round(font_size * scale))
+
+    def render(
+        self,
+        text: str,
+        *,
+        type: Literal["jpeg", "png", "webp"] = "jpeg",
+        quality: int | None = None,
+    ) -> bytes:
+        """将纯文本绘制为图片
+
+        Args:
+            text (str): 要绘制的文本，与 `convert_text` 相同地按行分段
+            type (Literal["jpeg", "png", "webp"], optional): 图片格式. 默认为 `jpeg`.
+            quality (Optional[int], optional): JPEG 与 WebP 的质量（0-100），PNG 时忽略. 默认为 80.
+
+        Returns:
+            bytes: 图片的字节
+        """
+        scale = self.scale
+        width = round(self.width * scale)
+        pad_y, pad_x = round(self.padding[0] * scale), round(self.padding[1] * scale)
+        spacing = round(self.paragraph_spacing * scale)
+        ascent, descent = self.font.getmetrics()
+        line_height = round(self.font_size * self.line_height * scale) if self.line_height else ascent + descent
+
+        # 与浏览器相同，空段落的高度为 0，其外边距与相邻段落合并
+        text = text.replace("\r\n", "\n").replace("\r", "\n").strip()
+        paragraphs = [self._wrap(line, width - 2 * pad_x) for line in text.split("\n") if line]
+        lines = sum(len(i) for i in paragraphs)
+        height = 2 * pad_y + lines * line_height + (len(paragraphs) + 1) * spacing if paragraphs else 2 * pad_y
+
+        image = Image.new("RGB", (width, max(1, height)), self.background)
+        draw = ImageDraw.Draw(image)
+        y = pad_y + spacing
+        for paragraph in paragraphs:
+            for line in paragraph:
+                # 行高大于字体高度时，与 CSS 相同地将多出的空间平分到文字上下
+                draw.text((pad_x, y + (line_height - ascent - descent) // 2), line, fill=self.color, font=self.font)
+                y += line_height
+            y += spacing
+
+        buffer = io.BytesIO()
+        if type == "png":
+            image.save(buffer, "PNG")
+        else:
+            image.save(buffer, type.upper(), quality=80 if quality is None else quality)
+        return buffer.getvalue()
+
+    async def arender(
+        self,
+        text: str,
+        *,
+        type: Literal["jpeg", "png", "webp"] = "jpeg",
+        quality: int | None = None,
+        executor: Executor | None = None,
+    ) -> bytes:
+        """在执行器中将纯文本绘制为图片，不阻塞事件循环
+
+        Args:
+            executor (Executor, optional): 本次绘制使用的执行器，默认使用 `self.executor`.
+            其余参数同 `render`.
+
+        Returns:
+            bytes: 图片的字节
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor or self.executor, partial(self.render, text, type=type, quality=quality)
+        )
+
+    def _wrap(self, text: str, max_width: int) -> list[str]:
+        lines: list[str] = []
+        current = ""
+        current_width = 0.0
+        for token in _TOKEN.findall(text):
+            token_width = self.font.getlength(token)
+            if current_width + token_width <= max_width:
+                current += token
+                current_width += token_width
+                continue
+            if token.isspace():
+                # 行尾的空白不换到下一行
+                continue
+            if current:
+                lines.append(current.rstrip())
+                current, current_width = "", 0.0
+            if token_width <= max_width:
+                current, current_width = token, token_width
+                continue
+            # 单个单词比整行还宽时按字符断开
+            for char in token:
+                char_width = self.font.getlength(char)
+                if current and current_width + char_width > max_width:
+                    lines.append(current.rstrip())
+                    current, current_width = "", 0.0
+                current += char
+                current_width += char_width
+        if current.strip() or not lines:
+            lines.append(current.rstrip())
+        return lines
+
+
+def _load_font(fonts: Sequence[str | Path], size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    for font in fonts:
+        try:
+            return ImageFont.truetype(str(font), size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
@@ -1,19 +1,41 @@
 from __future__ import annotations
 
+import asyncio
+import bisect
+import functools
 import importlib.resources
-from collections.abc import Awaitable, Callable, Sequence
+import json
+import math
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Awaitable, Callable, Sequence
+from concurrent.futures import Executor
+from contextlib import AbstractAsyncContextManager, AsyncExitStack, asynccontextmanager, nullcontext
 from enum import Enum
 from pathlib import Path
-from typing import Literal, overload
+from typing import TYPE_CHECKING, Literal, overload
+from weakref import WeakKeyDictionary
 
 from graiax.playwright import PlaywrightService
 from graiax.playwright.utils import Parameters as PageOption
 from launart import Launart
-from playwright.async_api import Browser, BrowserContext, Page
+from loguru import logger
+from playwright.async_api import Browser, BrowserContext, Page, ViewportSize
 from playwright.async_api._generated import Locator
 from typing_extensions import TypedDict
 
-from .utils import run_always_await
+from .metrics import RenderObserver, RenderPath, RenderRecord, activate, current_record, stage
+from .utils import run_always_await, write_file
+
+if TYPE_CHECKING:
+    # 以下模块仅在启用对应功能时才在使用处导入，使只用到基础渲染的程序启动更快
+    from .assets import AssetStore
+    from .cache import RenderCache
+    from .encoder import EncodedImage
+    from .pool import PagePool
+    from .pruner import CSSPruner
+    from .scheduler import RenderScheduler
+    from .shard import BrowserShards
 
 
 class FloatRect(TypedDict):
@@ -30,9 +52,11 @@ class ScreenshotOption(TypedDict, total=False):
 
     Args:
         timeout (float, optional): 截图超时时间.
-        type (Literal["jpeg", "png"], optional): 截图图片类型.
+        type (Literal["jpeg", "png", "webp"], optional): 截图图片类型.
+            `webp` 通过 Chromium 的 CDP 截图得到；在其他浏览器上或设置了 `mask` 时，将警告并退回为
+            JPEG（设置了 quality 时）或 PNG，此时若设置了 `path` 则抛出 ValueError 而不会写入与后缀不符的文件.
         path (Union[str, Path]], optional): 截图保存路径，如不需要则留空.
-        quality (int, optional): 截图质量，仅适用于 JPEG 格式图片.
+        quality (int, optional): 截图质量，仅适用于 JPEG 与 WebP 格式图片.
         omit_background (bool, optional): 是否允许隐藏默认的白色背景，这样就可以截透明图了，仅适用于 PNG 格式.
         full_page (bool, optional): 是否截整个页面而不是仅设置的视口大小，默认为 True.
         clip (FloatRect, optional): 截图后裁切的区域，xy为起点.
@@ -46,7 +70,7 @@ class ScreenshotOption(TypedDict, total=False):
     """
 
     timeout: float | None
-    type: Literal["jpeg", "png", None]
+    type: Literal["jpeg", "png", "webp", None]
     path: str | Path | None
     quality: int | None
     omit_background: bool | None
@@ -58,18 +82,107 @@ class ScreenshotOption(TypedDict, total=False):
     mask: list[Locator] | None
 
 
+class ReadyOption(TypedDict, total=False):
+    """页面就绪判断参数
+
+    决定载入内容后等待到什么时候才开始截图，各阶段的超时时间（毫秒）相互独立.
+
+    Args:
+        wait_until (Literal["commit", "domcontentloaded", "load", "networkidle"], optional):
+            载入内容时等待的事件，默认为 `load`. 常驻模板模式下，`commit` 与 `domcontentloaded`
+            不会等待新内容中的图片加载完成.
+        timeout (float, optional): 载入内容的超时时间.
+        fonts (bool, optional): 是否等待 `document.fonts.ready`，即所有已使用的 Web 字体加载完成. 默认为 False.
+        fonts_timeout (float, optional): 等待字体的超时时间.
+        predicate (str, optional): 自定义的 JS 表达式或函数，等待其返回真值后再截图.
+        predicate_timeout (float, optional): 等待自定义条件的超时时间.
+    """
+
+    wait_until: Literal["commit", "domcontentloaded", "load", "networkidle", None]
+    timeout: float | None
+    fonts: bool | None
+    fonts_timeout: float | None
+    predicate: str | None
+    predicate_timeout: float | None
+
+
 _CSS_MOD = "graiax.text2img.playwright.css"
 
 
 class BuiltinCSS(Enum):
-    """内置 CSS"""
+    """内置 CSS
+
+    各成员对应包内的 CSS 文件，文件内容在首次访问 `value` 时才读取.
+    """
+
+    reset = "reset.css"
+    github = "github.css"
+    one_dark = "one-dark.css"
+    container = "container.css"
+
+    @property
+    def value(self) -> str:
+        """CSS 文件的内容"""
+        return _read_css(self._value_)
 
-    value: str
 
-    reset = importlib.resources.read_text(_CSS_MOD, "reset.css")
-    github = importlib.resources.read_text(_CSS_MOD, "github.css")
-    one_dark = importlib.resources.read_text(_CSS_MOD, "one-dark.css")
-    container = importlib.resources.read_text(_CSS_MOD, "container.css")
+@functools.cache
+def _read_css(name: str) -> str:
+    return importlib.resources.read_text(_CSS_MOD, name)
+
+
+# 记录每个页面当前载入的模板所使用的样式，同一页面可能被多个渲染器共享
+_TEMPLATE_PAGES: WeakKeyDictionary[Page, str] = WeakKeyDictionary()
+
+_SWAP_BODY_JS = """async ([html, images]) => {
+    document.body.innerHTML = html;
+    if (!images) return;
+    await Promise.all(Array.from(document.images, (img) => img.complete ? null : new Promise((resolve) => {
+        img.onload = img.onerror = resolve;
+    })));
+}"""
+
+_FONTS_JS = "async () => { await document.fonts.ready; }"
+
+_MEASURE_JS = """(selector) => {
+    const element = document.querySelector(selector) || document.body;
+    const rect = element.getBoundingClientRect();
+    const style = getComputedStyle(element);
+    const left = rect.left - parseFloat(style.marginLeft);
+    const top = rect.top - parseFloat(style.marginTop);
+    return {
+        x: Math.max(0, left + window.scrollX),
+        y: Math.max(0, top + window.scrollY),
+        width: Math.ceil(rect.right + parseFloat(style.marginRight) - left),
+        height: Math.ceil(rect.bottom + parseFloat(style.marginBottom) - top),
+    };
+}"""
+
+_LAYOUT_JS = """(selector) => {
+    const root = document.querySelector(selector) || document.body;
+    return {
+        width: document.documentElement.clientWidth,
+        height: Math.ceil(document.documentElement.scrollHeight),
+        breaks: Array.from(root.children, (child) => Math.floor(child.getBoundingClientRect().top + window.scrollY)),
+    };
+}"""
+
+# 预热时默认渲染的文档，与 `convert_md` 的输出结构相同，覆盖中英文与 emoji 字体、代码高亮、表格与容器等常见元素
+_WARMUP_HTML = (
+    '<div class="markdown-body"><h1 id="预热-warmup">预热 Warmup</h1>\n'
+    "<p>中文与 English 混排，<strong>粗体</strong>、<em>斜体</em>、<code>code</code> 与"
+    ' <a href="#">链接</a> 😄</p>\n<ul>\n<li>列表</li>\n<li>list</li>\n</ul>\n'
+    "<blockquote>\n<p>引用</p>\n</blockquote>\n"
+    "<table>\n<thead>\n<tr>\n<th>A</th>\n<th>B</th>\n</tr>\n</thead>\n"
+    "<tbody>\n<tr>\n<td>1</td>\n<td>2</td>\n</tr>\n</tbody>\n</table>\n"
+    '<div class="language-python ext-py line-numbers-mode"><pre class="language-python"><code>'
+    '<span class="k">def</span><span class="w"> </span><span class="nf">f</span><span class="p">():</span>\n'
+    '    <span class="k">return</span> <span class="s2">&quot;字符串&quot;</span>  <span class="c1"># 注释</span>'
+    '</code></pre><div class="line-numbers" aria-hidden="true"><div class="line-number"></div>'
+    '<div class="line-number"></div></div></div><div style="color:#155f3e;border-color:rgba(66, 184, 131, .5);'
+    'background-color:rgba(66, 184, 131, .05)" class="tip container-block"><p class="container-block-title">提示</p>\n'
+    "<p>内容</p>\n</div>\n</div>"
+)
 
 
 class HTMLRenderer:
@@ -86,12 +199,50 @@ class HTMLRenderer:
             如有不需要或想覆盖这些默认 CSS，则传入一个包含 CSS 字符串的列表.
         page_modifiers (List[Callable[[Page], Union[Awaitable[None], None]]], optional): 接受 Page 实例的方法/函数.
             用于对 Page 本身进行额外的修改，如: 使用 page.route 重定向资源文件到本地文件.
+        page_pool (Optional[PagePool], optional): 页面池，传入后将复用池中预先创建的页面进行渲染，
+            而不是每次渲染都新建并关闭页面. page_modifiers 仅会在页面创建时执行一次.
+            页面池设置了上下文回收的阈值时，不再使用全局上下文，而是使用由页面池创建并定期回收的上下文.
+        template (bool, optional): 是否启用常驻模板模式. 启用后页面仅在首次使用时载入包含 CSS 的文档，
+            之后的渲染只替换 body 的内容，省去每次解析样式表的开销. 需配合页面池使用才有效果，
+            且通过该方式插入的 `<script>` 不会被执行. 默认为 False.
+        cache (Optional[RenderCache], optional): 渲染结果缓存，传入后相同的 HTML、样式、参数与页面来源
+            将直接返回缓存的图片. 直接传入 `context` 时无从得知其参数，不使用缓存.
+        prune_css (bool, optional): 是否在渲染前裁剪样式表，仅保留可能匹配 HTML 中出现的标签、class 与 id 的规则.
+            如页面中有通过 JS 动态添加的元素或 class 则不应开启. 默认为 False.
+        auto_fit (Union[bool, str], optional): 是否自动适配内容大小. 启用后将在排版完成后测量内容根元素
+            （默认为 body，传入字符串时为该 CSS 选择器对应的元素）的边界，将视口高度设置为恰好容纳该区域，
+            并仅截取该区域一次，不再使用 `full_page`. 截图参数中指定了 `clip` 时不生效. 默认为 False.
+        cdp_capture (bool, optional): 是否在 Chromium 上总是通过 CDP 的 `Page.captureScreenshot` 截图，
+            跳过 Playwright 截图时的额外步骤. 该方式不支持 `mask`（此时仍使用 Playwright 截图），
+            且会忽略 `animations` 与 `caret`. 截取 WebP 时总是使用该方式. 默认为 False.
+        assets (Optional[AssetStore], optional): 资源层. 传入后页面中的资源请求将由其提供的本地资源响应，
+            其余请求将被中止或以替代内容响应，渲染不会因远程资源而阻塞.
+        ready_option (Optional[ReadyOption], optional): 页面就绪判断参数，决定载入内容后等待到什么时候再截图.
+            默认与 `page.set_content` 相同，等待 `load` 事件.
+        scheduler (Optional[RenderScheduler], optional): 渲染调度器. 传入后同时进行的渲染数与排队将由其控制，
+            且 HTML、样式与参数都相同的并发渲染只会截图一次. 可以在多个渲染器之间共享.
+        shards (Optional[BrowserShards], optional): 浏览器分片. 传入后未指定 `browser` 与 `context` 的渲染
+            将分派到各个分片上进行，而不再使用 PlaywrightService. 同时使用页面池时，页面池的 `max_groups`
+            至少会被调整为分片数，分片重启后其在页面池中的分组会被关闭.
+        observers (Sequence[RenderObserver], optional): 渲染观察者. 每次渲染结束（包括失败与命中缓存）后
+            都会以该次渲染的 `RenderRecord` 调用，可用于将各阶段耗时等指标转发到监控系统.
     """
 
     page_option: PageOption
     screenshot_option: ScreenshotOption
     style: str
     page_modifiers: list[Callable[[Page], Awaitable[None] | None]]
+    page_pool: PagePool | None
+    template: bool
+    cache: RenderCache | None
+    css_pruner: CSSPruner | None
+    auto_fit: bool | str
+    cdp_capture: bool
+    assets: AssetStore | None
+    ready_option: ReadyOption
+    scheduler: RenderScheduler | None
+    shards: BrowserShards | None
+    observers: list[RenderObserver]
 
     def __init__(
         self,
@@ -105,6 +256,17 @@ class HTMLRenderer:
             BuiltinCSS.container,
         ),
         page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None = None,
+        page_pool: PagePool | None = None,
+        template: bool = False,
+        cache: RenderCache | None = None,
+        prune_css: bool = False,
+        auto_fit: bool | str = False,
+        cdp_capture: bool = False,
+        assets: AssetStore | None = None,
+        ready_option: ReadyOption | None = None,
+        scheduler: RenderScheduler | None = None,
+        shards: BrowserShards | None = None,
+        observers: Sequence[RenderObserver] = (),
     ):
         if isinstance(css, str):
             css = [css]
@@ -116,6 +278,26 @@ class HTMLRenderer:
         self.screenshot_option: ScreenshotOption = screenshot_option
         self.style: str = "\n".join(i.value if isinstance(i, BuiltinCSS) else i for i in css)
         self.page_modifiers = page_modifiers or []
+        self.page_pool = page_pool
+        self.template = template
+        self.cache = cache
+        if prune_css:
+            from .pruner import CSSPruner
+
+            self.css_pruner = CSSPruner(self.style)
+        else:
+            self.css_pruner = None
+        self.auto_fit = auto_fit
+        self.cdp_capture = cdp_capture
+        self.assets = assets
+        self.ready_option = ready_option or {}
+        self.scheduler = scheduler
+        self.shards = shards
+        self.observers = list(observers)
+        if shards is not None and page_pool is not None:
+            # 每个分片的浏览器各占一个分组，分组上限不足时页面池会不断关闭其他分片的上下文
+            page_pool.max_groups = max(page_pool.max_groups, shards.size)
+            shards.on_restart(self._drop_shard_groups)
 
     @overload
     async def render(
@@ -123,10 +305,12 @@ class HTMLRenderer:
         content: str,
         *,
         extra_screenshot_option: ScreenshotOption | None = None,
+        extra_ready_option: ReadyOption | None = None,
         extra_page_option: PageOption | None = None,
         extra_page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None = None,
         new_context: bool = False,
         use_global_context: bool = True,
+        priority: int = 0,
     ) -> bytes:
         ...
 
@@ -137,9 +321,11 @@ class HTMLRenderer:
         *,
         browser: Browser,
         extra_screenshot_option: ScreenshotOption | None = None,
+        extra_ready_option: ReadyOption | None = None,
         extra_page_option: PageOption | None = None,
         extra_page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None = None,
         new_context: bool = False,
+        priority: int = 0,
     ) -> bytes:
         ...
 
@@ -150,7 +336,9 @@ class HTMLRenderer:
         *,
         context: BrowserContext,
         extra_screenshot_option: ScreenshotOption | None = None,
+        extra_ready_option: ReadyOption | None = None,
         extra_page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None = None,
+        priority: int = 0,
     ) -> bytes:
         ...
 
@@ -161,10 +349,12 @@ class HTMLRenderer:
         browser: Browser | None = None,
         context: BrowserContext | None = None,
         extra_screenshot_option: ScreenshotOption | None = None,
+        extra_ready_option: ReadyOption | None = None,
         extra_page_option: PageOption | None = None,
         extra_page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None = None,
         new_context: bool = False,
         use_global_context: bool = True,
+        priority: int = 0,
     ) -> bytes:
         """渲染 HTML 代码为图片
 
@@ -178,58 +368,749 @@ class HTMLRenderer:
                 如果 `context` 和 `browser` 都不传入则会通过 `Launart` 自动获取.
                 与 `browser` 参数互斥，且不支持 `page_option` 和 `extra_page_option`.
             extra_screenshot_option (Optional[ScreenshotOption], optional): 额外的截图选项.
+            extra_ready_option (Optional[ReadyOption], optional): 额外的页面就绪判断参数.
             extra_page_option (Optional[PageOption], optional): 额外的页面设置.
             extra_page_modifiers (List[Callable[[Page], Union[Awaitable[None], None]]], optional):
                 接受 `Page` 实例的方法/函数.
                 用于对 Page 本身进行额外的修改，如: 使用 `page.route` 重定向资源文件到本地文件.
-                仅本次截图使用.
+                仅本次截图使用. 使用页面池时，执行过这些 page_modifiers 的页面用完后会被关闭而不再复用.
             new_content (bool, optional): 是否创建一个新上下文来渲染，可能可以避免一些
-                cookie 之类的问题，默认为否.
+                cookie 之类的问题，默认为否. 使用页面池时该参数会被忽略.
             use_global_context (bool, optional): 是否使用全局的上下文来截图.
                 当你使用持久上下文来启动 Playwright 时，必须使用全局上下文.
                 当你使用了 `page_option` 参数时该参数会被忽略.
+            priority (int, optional): 在调度器中排队时的优先级，越大越先执行. 未使用调度器时无效. 默认为 0.
 
         Returns:
             bytes: 渲染结果图的 bytes 数据
         """
         screenshot_option: ScreenshotOption = {**self.screenshot_option, **(extra_screenshot_option or {})}
-        page_modifiers: list[Callable[[Page], Awaitable[None] | None]] = self.page_modifiers + (
-            extra_page_modifiers or []
+        _check_screenshot_option(screenshot_option)
+        ready_option: ReadyOption = {**self.ready_option, **(extra_ready_option or {})}
+        pw_service, page_option, page_modifiers = self._prepare(
+            browser, context, extra_page_option, extra_page_modifiers
+        )
+
+        return await self._render_cached(
+            content,
+            page_option,
+            page_modifiers,
+            screenshot_option,
+            self._cache_variant(ready_option, pw_service, browser, context, page_option, use_global_context),
+            priority,
+            lambda: self._dispatch(
+                content,
+                pw_service,
+                browser,
+                context,
+                page_option,
+                page_modifiers,
+                screenshot_option,
+                ready_option,
+                new_context,
+                use_global_context,
+            ),
+        )
+
+    async def render_fit(
+        self,
+        content: str,
+        max_bytes: int,
+        *,
+        browser: Browser | None = None,
+        context: BrowserContext | None = None,
+        extra_screenshot_option: ScreenshotOption | None = None,
+        extra_ready_option: ReadyOption | None = None,
+        extra_page_option: PageOption | None = None,
+        extra_page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None = None,
+        new_context: bool = False,
+        use_global_context: bool = True,
+        priority: int = 0,
+        min_quality: int = 10,
+        min_scale: float = 0.25,
+        executor: Executor | None = None,
+    ) -> EncodedImage:
+        """渲染 HTML 代码为不超过 `max_bytes` 字节的图片
+
+        只截图一次无损的 PNG，之后在执行器中对质量与缩放比例进行二分查找，得到不超过限制时质量最高的图片，
+        无需为了降低质量反复截图. 需要安装可选依赖 Pillow.
+
+        Args:
+            content (str): 要渲染的 HTML 代码
+            max_bytes (int): 图片的最大字节数
+            extra_screenshot_option (Optional[ScreenshotOption], optional): 额外的截图选项.
+                `type` 决定输出格式，仅支持 `jpeg` 与 `webp`；`quality` 为质量的上限，默认为 90.
+                `omit_background` 时 WebP 保留透明背景，JPEG 不支持透明背景，会引发 ValueError.
+            min_quality (int, optional): 质量的下限. 默认为 10.
+            min_scale (float, optional): 缩放比例的下限. 默认为 0.25.
+            executor (Optional[Executor], optional): 编码使用的执行器，为 None 时使用事件循环默认的线程池.
+            其余参数同 `render`.
+
+        Raises:
+            ValueError: 以最低质量与最小缩放比例编码仍超出限制，或以 JPEG 输出透明背景
+
+        Returns:
+            EncodedImage: 图片的 bytes 数据与选中的格式、质量、缩放比例
+        """
+        from .encoder import afit_bytes
+
+        screenshot_option: ScreenshotOption = {**self.screenshot_option, **(extra_screenshot_option or {})}
+        image_type = screenshot_option.get("type") or "jpeg"
+        if image_type == "png":
+            raise ValueError("`max_bytes` requires a JPEG or WebP screenshot type.")
+        if image_type == "jpeg" and screenshot_option.get("omit_background"):
+            raise ValueError("JPEG does not support transparency, use WebP with `omit_background`.")
+        image = await self.render(
+            content,
+            browser=browser,  # type: ignore
+            context=context,  # type: ignore
+            extra_screenshot_option={**screenshot_option, "type": "png", "quality": None, "path": None},
+            extra_ready_option=extra_ready_option,
+            extra_page_option=extra_page_option,
+            extra_page_modifiers=extra_page_modifiers,
+            new_context=new_context,
+            use_global_context=use_global_context,
+            priority=priority,
+        )
+        encoded = await afit_bytes(
+            image,
+            max_bytes,
+            type=image_type,
+            max_quality=screenshot_option.get("quality") or 90,
+            min_quality=min_quality,
+            min_scale=min_scale,
+            executor=executor,
+        )
+        if path := screenshot_option.get("path"):
+            await asyncio.to_thread(write_file, Path(path), encoded.data)
+        return encoded
+
+    async def render_many(
+        self,
+        contents: Sequence[str],
+        *,
+        concurrency: int = 4,
+        browser: Browser | None = None,
+        context: BrowserContext | None = None,
+        extra_screenshot_option: ScreenshotOption | Sequence[ScreenshotOption | None] | None = None,
+        extra_ready_option: ReadyOption | None = None,
+        extra_page_option: PageOption | None = None,
+        extra_page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None = None,
+        use_global_context: bool = True,
+        priority: int = 0,
+    ) -> list[bytes]:
+        """批量渲染 HTML 代码为图片
+
+        所有内容共享同一个浏览器上下文，最多同时打开 `concurrency` 个页面，每个页面会被用于渲染多个内容.
+
+        Args:
+            contents (Sequence[str]): 要渲染的 HTML 代码列表
+            concurrency (int, optional): 最多同时进行的渲染数. 默认为 4.
+            extra_screenshot_option (Union[ScreenshotOption, Sequence[Optional[ScreenshotOption]], None], optional):
+                额外的截图选项. 传入单个 ScreenshotOption 时应用于所有内容，
+                传入列表时按下标分别应用于对应的内容.
+            其余参数同 `render`.
+
+        Returns:
+            list[bytes]: 与 `contents` 顺序一致的渲染结果
+        """
+        results: list[bytes] = [b""] * len(contents)
+        async for index, data in self.iter_render(
+            contents,
+            concurrency=concurrency,
+            browser=browser,
+            context=context,
+            extra_screenshot_option=extra_screenshot_option,
+            extra_ready_option=extra_ready_option,
+            extra_page_option=extra_page_option,
+            extra_page_modifiers=extra_page_modifiers,
+            use_global_context=use_global_context,
+            priority=priority,
+        ):
+            results[index] = data
+        return results
+
+    async def iter_render(
+        self,
+        contents: Sequence[str],
+        *,
+        concurrency: int = 4,
+        browser: Browser | None = None,
+        context: BrowserContext | None = None,
+        extra_screenshot_option: ScreenshotOption | Sequence[ScreenshotOption | None] | None = None,
+        extra_ready_option: ReadyOption | None = None,
+        extra_page_option: PageOption | None = None,
+        extra_page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None = None,
+        use_global_context: bool = True,
+        priority: int = 0,
+    ) -> AsyncGenerator[tuple[int, bytes], None]:
+        """批量渲染 HTML 代码为图片，每完成一张便产出一次
+
+        参数同 `render_many`.
+
+        Yields:
+            tuple[int, bytes]: 内容在 `contents` 中的下标与其渲染结果，按完成顺序产出
+        """
+        if concurrency < 1:
+            raise ValueError("`concurrency` must be at least 1.")
+        if extra_screenshot_option is None or isinstance(extra_screenshot_option, dict):
+            screenshot_options = [extra_screenshot_option] * len(contents)
+        elif len(extra_screenshot_option) != len(contents):
+            raise ValueError("`extra_screenshot_option` must have the same length as `contents`.")
+        else:
+            screenshot_options = list(extra_screenshot_option)
+        for option in screenshot_options:
+            _check_screenshot_option({**self.screenshot_option, **(option or {})})
+        ready_option: ReadyOption = {**self.ready_option, **(extra_ready_option or {})}
+        pw_service, page_option, page_modifiers = self._prepare(
+            browser, context, extra_page_option, extra_page_modifiers
+        )
+
+        variant = self._cache_variant(ready_option, pw_service, browser, context, page_option, use_global_context)
+        pending = deque(enumerate(contents))
+        results: asyncio.Queue[tuple[int, bytes] | BaseException] = asyncio.Queue()
+
+        async with AsyncExitStack() as stack:
+            shared_context: BrowserContext | None = None
+            context_lock = asyncio.Lock()
+
+            async def new_page() -> Page:
+                nonlocal shared_context
+                with stage("acquire"):
+                    async with context_lock:
+                        if shared_context is None:
+                            if context is not None:
+                                shared_context = context
+                            elif browser is not None:
+                                shared_context = await stack.enter_async_context(_new_context(browser, page_option))
+                            else:
+                                assert pw_service is not None
+                                shared_context = await stack.enter_async_context(
+                                    pw_service.context(use_global_context=use_global_context, **page_option)
+                                )
+                    page = await shared_context.new_page()
+                try:
+                    with stage("modifiers"):
+                        for modifier in page_modifiers:
+                            await run_always_await(modifier, page)
+                except BaseException:
+                    await page.close()
+                    raise
+                return page
+
+            async def worker() -> None:
+                page: Page | None = None
+
+                async def produce(content: str, screenshot_option: ScreenshotOption) -> bytes:
+                    nonlocal page
+                    if self.shards is not None and browser is None and context is None:
+                        # 每次渲染都重新选择分片，使负载分散到各个浏览器上
+                        return await self._dispatch(
+                            content,
+                            pw_service,
+                            None,
+                            None,
+                            page_option,
+                            page_modifiers,
+                            screenshot_option,
+                            ready_option,
+                            False,
+                            use_global_context,
+                        )
+                    if (record := current_record()) is not None:
+                        record.path = self._render_path(pw_service, browser, context, page_option, use_global_context)
+                        record.pooled = self.page_pool is not None
+                    if self.page_pool is not None:
+                        async with AsyncExitStack() as page_stack:
+                            with stage("acquire"):
+                                pooled, extra = await page_stack.enter_async_context(
+                                    self._pooled_page(
+                                        self.page_pool,
+                                        pw_service,
+                                        browser,
+                                        context,
+                                        page_option,
+                                        use_global_context,
+                                        page_modifiers,
+                                    )
+                                )
+                            return await self._render(pooled, content, extra, screenshot_option, ready_option)
+                    if page is None:
+                        page = await new_page()
+                    try:
+                        return await self._render(page, content, [], screenshot_option, ready_option)
+                    except BaseException:
+                        await page.close()
+                        page = None
+                        raise
+
+                try:
+                    while pending:
+                        index, content = pending.popleft()
+                        screenshot_option: ScreenshotOption = {
+                            **self.screenshot_option,
+                            **(screenshot_options[index] or {}),
+                        }
+                        try:
+                            data = await self._render_cached(
+                                content,
+                                page_option,
+                                page_modifiers,
+                                screenshot_option,
+                                variant,
+                                priority,
+                                lambda: produce(content, screenshot_option),
+                            )
+                        except Exception as e:
+                            results.put_nowait(e)
+                            return
+                        results.put_nowait((index, data))
+                finally:
+                    if page is not None:
+                        await page.close()
+
+            workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(pending)))]
+            try:
+                for _ in range(len(contents)):
+                    item = await results.get()
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+    async def render_tiles(
+        self,
+        content: str,
+        *,
+        max_height: int = 4096,
+        break_selector: str = ".markdown-body",
+        browser: Browser | None = None,
+        context: BrowserContext | None = None,
+        extra_screenshot_option: ScreenshotOption | None = None,
+        extra_ready_option: ReadyOption | None = None,
+        extra_page_option: PageOption | None = None,
+        extra_page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None = None,
+        new_context: bool = False,
+        use_global_context: bool = True,
+        priority: int = 0,
+    ) -> list[bytes]:
+        """将 HTML 代码分块渲染为多张图片
+
+        参数同 `iter_tiles`.
+
+        Returns:
+            list[bytes]: 自上而下排列的各个分块的图片
+        """
+        return [
+            tile
+            async for tile in self.iter_tiles(
+                content,
+                max_height=max_height,
+                break_selector=break_selector,
+                browser=browser,
+                context=context,
+                extra_screenshot_option=extra_screenshot_option,
+                extra_ready_option=extra_ready_option,
+                extra_page_option=extra_page_option,
+                extra_page_modifiers=extra_page_modifiers,
+                new_context=new_context,
+                use_global_context=use_global_context,
+                priority=priority,
+            )
+        ]
+
+    async def iter_tiles(
+        self,
+        content: str,
+        *,
+        max_height: int = 4096,
+        break_selector: str = ".markdown-body",
+        browser: Browser | None = None,
+        context: BrowserContext | None = None,
+        extra_screenshot_option: ScreenshotOption | None = None,
+        extra_ready_option: ReadyOption | None = None,
+        extra_page_option: PageOption | None = None,
+        extra_page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None = None,
+        new_context: bool = False,
+        use_global_context: bool = True,
+        priority: int = 0,
+    ) -> AsyncGenerator[bytes, None]:
+        """将 HTML 代码分块渲染为多张图片，每截取一块便产出一次
+
+        页面仅载入一次，之后将视口高度设置为分块高度并逐块滚动截图，
+        因此无论文档多长，浏览器每次只需要绘制不超过 `max_height` 高的区域.
+        分块会尽量在 `break_selector` 对应元素的子元素之间断开，单个子元素超过 `max_height` 时才会从中间截断.
+
+        Args:
+            content (str): 要渲染的 HTML 代码
+            max_height (int, optional): 每块的最大高度（CSS 像素）. 默认为 4096.
+            break_selector (str, optional): 用于寻找断点的根元素的 CSS 选择器，找不到时使用 body.
+                默认为 `.markdown-body`.
+            extra_screenshot_option (Optional[ScreenshotOption], optional): 额外的截图选项.
+                其中的 `full_page`、`clip` 与 `path` 将被忽略.
+            其余参数同 `render`.
+
+        Yields:
+            bytes: 自上而下的各个分块的图片
+        """
+        if max_height < 1:
+            raise ValueError("`max_height` must be at least 1.")
+        screenshot_option: ScreenshotOption = {**self.screenshot_option, **(extra_screenshot_option or {})}
+        for key in ("full_page", "clip", "path"):
+            screenshot_option.pop(key, None)
+        ready_option: ReadyOption = {**self.ready_option, **(extra_ready_option or {})}
+        pw_service, page_option, page_modifiers = self._prepare(
+            browser, context, extra_page_option, extra_page_modifiers
         )
 
-        launart = Launart.current()
+        # 异步生成器在调用方的上下文中运行，因此仅在不跨越 yield 的片段中设置当前记录
+        record = RenderRecord(html_bytes=len(content.encode())) if self.observers else None
+        begin = time.perf_counter()
+        try:
+            async with AsyncExitStack() as stack:
+                with activate(record):
+                    if self.scheduler is not None:
+                        await stack.enter_async_context(self.scheduler.slot(priority, self.scheduler.queue_timeout))
+                    if self.shards is not None and browser is None and context is None:
+                        browser, context = _shard_target(await stack.enter_async_context(self.shards.acquire()))
+                    page, modifiers = await stack.enter_async_context(
+                        self._page(
+                            pw_service, browser, context, page_option, page_modifiers, new_context, use_global_context
+                        )
+                    )
+                    await self._load(page, content, modifiers, ready_option)
+                    layout = await page.evaluate(_LAYOUT_JS, break_selector)
+                width: int = layout["width"]
+                original_viewport = page.viewport_size
+                try:
+                    for start, end in _tile_ranges(layout["height"], layout["breaks"], max_height):
+                        height = end - start
+                        with activate(record), stage("screenshot"):
+                            viewport = page.viewport_size
+                            if viewport is None or viewport["width"] != width or viewport["height"] != height:
+                                await page.set_viewport_size({"width": width, "height": height})
+                            await page.evaluate("(y) => window.scrollTo(0, y)", start)
+                            clip: FloatRect = {"x": 0, "y": 0, "width": width, "height": height}
+                            tile = await self._screenshot(page, {**screenshot_option, "full_page": False, "clip": clip})
+                        if record is not None:
+                            record.image_bytes += len(tile)
+                        yield tile
+                finally:
+                    # 页面可能归还到页面池，需恢复滚动位置与视口，否则之后的渲染会使用最后一块的尺寸
+                    await _restore_page(page, original_viewport, scroll=True)
+        except BaseException as e:
+            if record is not None:
+                record.error = e
+            raise
+        finally:
+            if record is not None:
+                record.total = time.perf_counter() - begin
+                await self._notify(record)
+
+    async def warmup(
+        self,
+        content: str | None = None,
+        *,
+        concurrency: int | None = None,
+        browser: Browser | None = None,
+        context: BrowserContext | None = None,
+        extra_page_option: PageOption | None = None,
+        use_global_context: bool = True,
+    ) -> None:
+        """预热渲染器
+
+        浏览器的字体缓存、样式表的解析与页面的创建都发生在首次渲染时，使重启后最初的几次渲染明显慢于平时.
+        该方法启动所有分片，并以 `concurrency` 个并发渲染一遍 `content`，从而创建好页面池中的页面、
+        在常驻模板模式下载入模板、并让浏览器提前载入字体. 预热的渲染不经过缓存与调度器，也不会通知观察者.
+
+        Args:
+            content (Optional[str], optional): 用于预热的 HTML 代码，为 None 时使用一篇包含中英文、emoji、
+                代码块、表格与容器的示例文档. 默认为 None.
+            concurrency (Optional[int], optional): 同时进行的渲染数，为 None 时为页面池的 `size`
+                （未使用页面池时为 1）乘以分片数，使池中的每个页面都被使用一次.
+            其余参数同 `render`.
+        """
+        if self.shards is not None:
+            await self.shards.start()
+        screenshot_option: ScreenshotOption = {**self.screenshot_option, "path": None}
+        pw_service, page_option, page_modifiers = self._prepare(browser, context, extra_page_option, None)
+        if concurrency is None:
+            concurrency = self.page_pool.size if self.page_pool is not None else 1
+            if self.shards is not None and browser is None and context is None:
+                concurrency *= self.shards.size
+        content = _WARMUP_HTML if content is None else content
+        await asyncio.gather(
+            *(
+                self._dispatch(
+                    content,
+                    pw_service,
+                    browser,
+                    context,
+                    page_option,
+                    page_modifiers,
+                    screenshot_option,
+                    self.ready_option,
+                    False,
+                    use_global_context,
+                )
+                for _ in range(max(concurrency, 1))
+            )
+        )
+
+    async def _drop_shard_groups(self, target: Browser | BrowserContext) -> None:
+        """分片重启后，关闭页面池中属于旧浏览器的分组"""
+        if self.page_pool is not None:
+            await self.page_pool.close_groups(lambda key: isinstance(key, tuple) and key[1] is target)
+
+    def _prepare_modifiers(self) -> list[Callable[[Page], Awaitable[None] | None]]:
+        """渲染器自身的 page_modifiers，资源层的路由总是最先安装"""
+        if self.assets is not None:
+            return [self.assets.install, *self.page_modifiers]
+        return list(self.page_modifiers)
+
+    def _prepare(
+        self,
+        browser: Browser | None,
+        context: BrowserContext | None,
+        extra_page_option: PageOption | None,
+        extra_page_modifiers: list[Callable[[Page], Awaitable[None] | None]] | None,
+    ) -> tuple[PlaywrightService | None, PageOption, list[Callable[[Page], Awaitable[None] | None]]]:
+        page_modifiers = self._prepare_modifiers() + (extra_page_modifiers or [])
+
         page_option: PageOption = {**self.page_option, **(extra_page_option or {})}
 
         if (browser is not None) and (context is not None):
             raise ValueError("Argument `browser` and `context` conflict with each other.")
 
-        pw_service = launart.get_component(PlaywrightService)
+        # 自行指定了浏览器或使用分片时不需要 PlaywrightService
+        if browser is not None or context is not None or self.shards is not None:
+            return None, page_option, page_modifiers
+
+        pw_service = Launart.current().get_component(PlaywrightService)
 
         if page_option and pw_service.use_persistent_context:
             raise ValueError("`page_option` and `extra_page_option` conflicts with persistence context.")
 
-        _context: BrowserContext | None = None
+        return pw_service, page_option, page_modifiers
 
-        if context is not None:
-            page = await context.new_page()
-            _bytes = await self._render(page, content, page_modifiers, screenshot_option)
-            await page.close()
+    async def _render_cached(
+        self,
+        content: str,
+        page_option: PageOption,
+        page_modifiers: list[Callable[[Page], Awaitable[None] | None]],
+        screenshot_option: ScreenshotOption,
+        variant: str | None,
+        priority: int,
+        produce: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        async with self._observe(content) as record:
+            cache_key: str | None = None
+            if variant is not None and (
+                self.cache is not None or (self.scheduler is not None and self.scheduler.coalesce)
+            ):
+                from .cache import RenderCache
+
+                cache_key = RenderCache.make_key(
+                    content, self.style, screenshot_option, page_option, page_modifiers, variant
+                )
+            if self.cache is not None and cache_key is not None:
+                if (cached := await self.cache.get(cache_key)) is not None:
+                    if path := screenshot_option.get("path"):
+                        await asyncio.to_thread(write_file, Path(path), cached)
+                    if record is not None:
+                        record.cached = True
+                        record.image_bytes = len(cached)
+                    return cached
+
+            if self.scheduler is not None:
+                # 缓存键不包含保存路径，而合并的渲染只会写入第一个调用方的路径，因此合并时需要区分路径
+                flight_key = f"{cache_key}:{screenshot_option.get('path') or ''}" if cache_key is not None else None
+                _bytes = await self.scheduler.submit(produce, key=flight_key, priority=priority)
+            else:
+                _bytes = await produce()
+            if record is not None:
+                record.image_bytes = len(_bytes)
+            if self.cache is not None and cache_key is not None:
+                try:
+                    await self.cache.set(cache_key, _bytes)
+                except Exception:
+                    # 写入缓存失败不影响已经完成的渲染
+                    logger.exception("Failed to write render cache")
             return _bytes
 
+    @asynccontextmanager
+    async def _observe(self, content: str) -> AsyncGenerator[RenderRecord | None, None]:
+        """为一次渲染创建指标记录，结束后通知观察者；没有观察者时不记录"""
+        if not self.observers:
+            yield None
+            return
+        record = RenderRecord(html_bytes=len(content.encode()))
+        begin = time.perf_counter()
+        try:
+            with activate(record):
+                yield record
+        except BaseException as e:
+            record.error = e
+            raise
+        finally:
+            record.total = time.perf_counter() - begin
+            await self._notify(record)
+
+    async def _notify(self, record: RenderRecord) -> None:
+        for observer in self.observers:
+            try:
+                await run_always_await(observer, record)
+            except Exception:
+                logger.exception(f"Render observer {observer!r} failed")
+
+    async def _dispatch(
+        self,
+        content: str,
+        pw_service: PlaywrightService | None,
+        browser: Browser | None,
+        context: BrowserContext | None,
+        page_option: PageOption,
+        page_modifiers: list[Callable[[Page], Awaitable[None] | None]],
+        screenshot_option: ScreenshotOption,
+        ready_option: ReadyOption,
+        new_context: bool,
+        use_global_context: bool,
+    ) -> bytes:
+        async with AsyncExitStack() as stack:
+            if self.shards is not None and browser is None and context is None:
+                browser, context = _shard_target(await stack.enter_async_context(self.shards.acquire()))
+            page, modifiers = await stack.enter_async_context(
+                self._page(pw_service, browser, context, page_option, page_modifiers, new_context, use_global_context)
+            )
+            return await self._render(page, content, modifiers, screenshot_option, ready_option)
+
+    @asynccontextmanager
+    async def _page(
+        self,
+        pw_service: PlaywrightService | None,
+        browser: Browser | None,
+        context: BrowserContext | None,
+        page_option: PageOption,
+        page_modifiers: list[Callable[[Page], Awaitable[None] | None]],
+        new_context: bool,
+        use_global_context: bool,
+    ) -> AsyncGenerator[tuple[Page, list[Callable[[Page], Awaitable[None] | None]]], None]:
+        """获取用于渲染的页面，同时给出仍需在该页面上执行的 page_modifiers"""
+        if (record := current_record()) is not None:
+            record.path = self._render_path(pw_service, browser, context, page_option, use_global_context)
+            record.pooled = self.page_pool is not None
+
+        async with AsyncExitStack() as stack:
+            with stage("acquire"):
+                if self.page_pool is not None:
+                    page, page_modifiers = await stack.enter_async_context(
+                        self._pooled_page(
+                            self.page_pool,
+                            pw_service,
+                            browser,
+                            context,
+                            page_option,
+                            use_global_context,
+                            page_modifiers,
+                        )
+                    )
+                elif context is not None:
+                    page = await context.new_page()
+                    stack.push_async_callback(page.close)
+                elif browser is not None:
+                    _context = await stack.enter_async_context(_new_context(browser, page_option))
+                    page = await _context.new_page()
+                    stack.push_async_callback(page.close)
+                else:
+                    assert pw_service is not None
+                    page = await stack.enter_async_context(
+                        pw_service.page(
+                            use_global_context=use_global_context, without_new_context=not new_context, **page_option
+                        )
+                    )
+            yield page, page_modifiers
+
+    def _render_path(
+        self,
+        pw_service: PlaywrightService | None,
+        browser: Browser | None,
+        context: BrowserContext | None,
+        page_option: PageOption,
+        use_global_context: bool,
+    ) -> RenderPath:
+        if context is not None:
+            return "context"
         if browser is not None:
-            _context = await browser.new_context()
-            page = await _context.new_page()
-            _bytes = await self._render(page, content, page_modifiers, screenshot_option)
-            await page.close()
-            await _context.close()
-            return _bytes
+            return "browser"
+        assert pw_service is not None
+        if pw_service.use_persistent_context:
+            return "global_context"
+        if self.page_pool is not None and self.page_pool.recycles_contexts:
+            # 与 `_pooled_page` 一致，回收上下文时页面池不使用全局上下文
+            return "new_context"
+        if use_global_context and not page_option:
+            return "global_context"
+        return "new_context"
 
-        # if browser is None and context is None:
-        async with pw_service.page(
-            use_global_context=use_global_context, without_new_context=not new_context, **page_option
-        ) as page:
-            _bytes = await self._render(page, content, page_modifiers, screenshot_option)
-            return _bytes
+    @staticmethod
+    def _document(content: str, style: str) -> str:
+        return (
+            '<html><head><meta name="viewport" content="width=device-width,initial-scale=1.0">'
+            f"<style>{style}</style></head><body>{content}<body></html>"
+        )
+
+    @asynccontextmanager
+    async def _pooled_page(
+        self,
+        pool: PagePool,
+        pw_service: PlaywrightService | None,
+        browser: Browser | None,
+        context: BrowserContext | None,
+        page_option: PageOption,
+        use_global_context: bool,
+        page_modifiers: list[Callable[[Page], Awaitable[None] | None]],
+    ) -> AsyncGenerator[tuple[Page, list[Callable[[Page], Awaitable[None] | None]]], None]:
+        """从页面池借出页面，同时给出仍需在该页面上执行的 page_modifiers
+
+        分组只按渲染器自身的 page_modifiers 区分. 单次渲染额外传入的 page_modifiers 在借出的页面上执行，
+        该页面用完后关闭而不再归还，避免为每个临时的 page_modifier 创建新的分组，也不会影响之后的渲染.
+        """
+        from .pool import freeze
+
+        # `_prepare` 总是将渲染器自身的 page_modifiers 放在前面
+        shared = self._prepare_modifiers()
+        extra = page_modifiers[len(shared) :]
+        modifiers = tuple(page_modifiers[: len(shared)])
+        context_factory: Callable[[], AbstractAsyncContextManager[BrowserContext]]
+        if context is not None:
+            key = ("context", context, modifiers)
+            context_factory = lambda: nullcontext(context)  # noqa: E731
+        elif browser is not None:
+            key = ("browser", browser, freeze(page_option), modifiers)
+            context_factory = lambda: _new_context(browser, page_option)  # noqa: E731
+        else:
+            assert pw_service is not None
+            context_option = page_option
+            # 全局上下文无法关闭，回收上下文时页面池改为使用自行创建的上下文；持久上下文则只能回收页面
+            if pool.recycles_contexts and not pw_service.use_persistent_context:
+                if use_global_context and not page_option:
+                    # 本应使用全局上下文，自行创建的上下文沿用启动服务时给出的全局上下文参数
+                    context_option = dict(getattr(pw_service, "global_context_config", None) or {})
+                use_global_context = False
+            key = ("service", use_global_context, freeze(context_option), modifiers)
+            context_factory = lambda: pw_service.context(  # noqa: E731
+                use_global_context=use_global_context, **context_option
+            )
+        async with pool.page(key, context_factory, modifiers) as page:
+            try:
+                yield page, extra
+            finally:
+                if extra:
+                    # 关闭的页面在归还时会被页面池丢弃
+                    await page.close()
 
     async def _render(
         self,
@@ -237,12 +1118,176 @@ class HTMLRenderer:
         content: str,
         page_modifiers: list[Callable[[Page], Awaitable[None] | None]],
         screenshot_option: ScreenshotOption,
+        ready_option: ReadyOption,
     ) -> bytes:
-        for modifier in page_modifiers:
-            await run_always_await(modifier, page)
+        await self._load(page, content, page_modifiers, ready_option)
+        with stage("screenshot"):
+            return await self._capture(page, screenshot_option)
 
-        await page.set_content(
-            '<html><head><meta name="viewport" content="width=device-width,initial-scale=1.0">'
-            f"<style>{self.style}</style></head><body>{content}<body></html>"
+    async def _load(
+        self,
+        page: Page,
+        content: str,
+        page_modifiers: list[Callable[[Page], Awaitable[None] | None]],
+        ready_option: ReadyOption,
+    ) -> None:
+        if page_modifiers:
+            with stage("modifiers"):
+                for modifier in page_modifiers:
+                    await run_always_await(modifier, page)
+        if self.assets is not None:
+            self.assets.begin(page)
+
+        style = self.css_pruner.prune(content) if self.css_pruner is not None else self.style
+        if (record := current_record()) is not None:
+            record.css_bytes = len(style.encode())
+        wait_until = ready_option.get("wait_until")
+        timeout = ready_option.get("timeout")
+        with stage("set_content"):
+            if not self.template:
+                _TEMPLATE_PAGES.pop(page, None)
+                await page.set_content(self._document(content, style), timeout=timeout, wait_until=wait_until)
+            else:
+                if _TEMPLATE_PAGES.get(page) != style:
+                    await page.set_content(self._document("", style), timeout=timeout, wait_until=wait_until)
+                    _TEMPLATE_PAGES[page] = style
+                swap = page.evaluate(_SWAP_BODY_JS, [content, wait_until not in ("commit", "domcontentloaded")])
+                await (asyncio.wait_for(swap, timeout / 1000) if timeout else swap)
+
+        if not ready_option.get("fonts") and not ready_option.get("predicate"):
+            return
+        with stage("ready"):
+            if ready_option.get("fonts"):
+                fonts = page.evaluate(_FONTS_JS)
+                fonts_timeout = ready_option.get("fonts_timeout")
+                await (asyncio.wait_for(fonts, fonts_timeout / 1000) if fonts_timeout else fonts)
+            if predicate := ready_option.get("predicate"):
+                await page.wait_for_function(predicate, timeout=ready_option.get("predicate_timeout"))
+
+    async def _capture(self, page: Page, screenshot_option: ScreenshotOption) -> bytes:
+        if not self.auto_fit or screenshot_option.get("clip") or page.viewport_size is None:
+            return await self._screenshot(page, screenshot_option)
+
+        selector = self.auto_fit if isinstance(self.auto_fit, str) else "body"
+        clip: FloatRect = await page.evaluate(_MEASURE_JS, selector)
+        viewport = page.viewport_size
+        height = math.ceil(clip["y"] + clip["height"])
+        width = max(viewport["width"], math.ceil(clip["x"] + clip["width"]))
+        if viewport["height"] == height and viewport["width"] == width:
+            return await self._screenshot(page, {**screenshot_option, "full_page": False, "clip": clip})
+        try:
+            await page.set_viewport_size({"width": width, "height": height})
+            return await self._screenshot(page, {**screenshot_option, "full_page": False, "clip": clip})
+        finally:
+            # 页面池与常驻模板中的页面会被复用，恢复为 page_option 指定的视口
+            await _restore_page(page, viewport)
+
+    async def _screenshot(self, page: Page, screenshot_option: ScreenshotOption) -> bytes:
+        webp = screenshot_option.get("type") == "webp"
+        mask = bool(screenshot_option.get("mask"))
+        if (webp or self.cdp_capture) and not mask:
+            from .capture import cdp_screenshot, cdp_session
+
+            session = await cdp_session(page)
+            if session is not None:
+                return await cdp_screenshot(page, session, screenshot_option)
+        if webp:
+            # WebP 只能通过 CDP 截得，CDP 截图又不支持 mask，此时退回为 Playwright 支持的格式
+            fallback = "jpeg" if screenshot_option.get("quality") is not None else "png"
+            reason = "`mask` is not supported by the CDP capture path" if mask else "the browser does not support CDP"
+            if screenshot_option.get("path"):
+                raise ValueError(f"Cannot save a WebP screenshot to `path`: {reason}.")
+            logger.warning(f"WebP screenshot is unavailable ({reason}), falling back to {fallback.upper()}")
+            screenshot_option = {**screenshot_option, "type": fallback}
+        return await page.screenshot(**screenshot_option)  # type: ignore
+
+    def _cache_variant(
+        self,
+        ready_option: ReadyOption,
+        pw_service: PlaywrightService | None,
+        browser: Browser | None,
+        context: BrowserContext | None,
+        page_option: PageOption,
+        use_global_context: bool,
+    ) -> str | None:
+        """描述会影响渲染结果的渲染器设置与页面来源，无从得知页面来源的设置时返回 None，此时不缓存"""
+        if context is not None:
+            # 传入的上下文的参数（如 device_scale_factor）无从得知
+            return None
+        if browser is not None:
+            source = f"browser:{browser.browser_type.name}/{browser.version}"
+        elif self.shards is not None:
+            if (token := self.shards.cache_token) is None:
+                return None
+            source = f"shards:{token}"
+        else:
+            assert pw_service is not None
+            path = self._render_path(pw_service, browser, context, page_option, use_global_context)
+            launch_config = getattr(pw_service, "launch_config", None) or {}
+            # 持久上下文的参数在 launch_config 中；回收上下文时页面池的上下文同样沿用全局上下文的参数
+            context_config = (
+                getattr(pw_service, "global_context_config", None) or {}
+                if use_global_context and not page_option and not pw_service.use_persistent_context
+                else {}
+            )
+            config = json.dumps([launch_config, context_config], sort_keys=True, default=repr)
+            source = f"service:{pw_service.browser_type}:{path}:{config}"
+        # 就绪判断可能改变截到的内容（如字体是否已加载），超时时间则不影响结果
+        ready = {k: v for k, v in ready_option.items() if k in ("wait_until", "fonts", "predicate") and v}
+        return (
+            f"auto_fit={self.auto_fit!r};cdp_capture={self.cdp_capture!r};ready={sorted(ready.items())!r};"
+            f"source={source}"
         )
-        return await page.screenshot(**screenshot_option)
+
+
+def _check_screenshot_option(screenshot_option: ScreenshotOption) -> None:
+    """检查截图选项中无法满足的组合"""
+    if screenshot_option.get("type") == "webp" and screenshot_option.get("mask") and screenshot_option.get("path"):
+        # WebP 只能通过不支持 mask 的 CDP 截得，退回的格式与 path 要求的格式不符
+        raise ValueError("A WebP screenshot with `mask` cannot be saved to `path`.")
+
+
+def _tile_ranges(height: int, breaks: Sequence[int], max_height: int) -> list[tuple[int, int]]:
+    """将 [0, height) 切分为不超过 max_height 的区间，尽量在 breaks 处断开"""
+    breaks = sorted({i for i in breaks if 0 < i < height})
+    ranges: list[tuple[int, int]] = []
+    start = 0
+    while height - start > max_height:
+        limit = start + max_height
+        idx = bisect.bisect_right(breaks, limit) - 1
+        end = breaks[idx] if idx >= 0 and breaks[idx] > start else limit
+        ranges.append((start, end))
+        start = end
+    ranges.append((start, height))
+    return ranges
+
+
+@asynccontextmanager
+async def _new_context(browser: Browser, page_option: PageOption) -> AsyncGenerator[BrowserContext, None]:
+    context = await browser.new_context(**page_option)
+    try:
+        yield context
+    finally:
+        await context.close()
+
+
+def _shard_target(target: Browser | BrowserContext) -> tuple[Browser | None, BrowserContext | None]:
+    if isinstance(target, BrowserContext):
+        return None, target
+    return target, None
+
+
+async def _restore_page(page: Page, viewport: ViewportSize | None, *, scroll: bool = False) -> None:
+    """恢复页面的视口与滚动位置. 无法恢复时关闭页面，页面池不会再复用已关闭的页面"""
+    if page.is_closed():
+        return
+    try:
+        if scroll:
+            await page.evaluate("() => window.scrollTo(0, 0)")
+        if viewport is not None and page.viewport_size != viewport:
+            await page.set_viewport_size(viewport)
+    except Exception:
+        try:
+            await page.close()
+        except Exception:
+            pass
@@ -0,0 +1,207 @@
+"""渲染调度
+
+限制同时进行的渲染数，超出的渲染按优先级排队等待；相同的并发渲染只截图一次，结果由所有调用方共享.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from .metrics import current_record, stage
+
+
+class QueueFullError(RuntimeError):
+    """等待队列已满，渲染请求被拒绝"""
+
+
+class QueueTimeoutError(TimeoutError):
+    """渲染请求在等待队列中超时"""
+
+
+@dataclass
+class SchedulerStats:
+    """调度统计信息"""
+
+    submitted: int = 0
+    coalesced: int = 0
+    queued: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+    peak_in_flight: int = 0
+    peak_queue: int = 0
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Future[bytes]
+    callers: int = 0
+
+
+class RenderScheduler:
+    """渲染调度器
+
+    同时最多进行 `max_in_flight` 个渲染（即最多占用这么多页面），其余的渲染进入有界的等待队列，
+    优先级高的先执行，同一优先级先到先得. 队列已满时立即抛出 `QueueFullError`，
+    在队列中等待超过 `queue_timeout` 秒时抛出 `QueueTimeoutError`，从而在过载时快速失败而不是压垮浏览器.
+
+    启用合并时，键相同的并发渲染只会实际执行一次，所有调用方共享同一个结果（或异常）.
+    所有调用方都取消后，尚未完成的渲染也会被取消.
+
+    用法:
+        ```python
+        renderer = HTMLRenderer(scheduler=RenderScheduler(4, max_queue=128, queue_timeout=10))
+        image = await renderer.render(html, priority=10)
+        ```
+
+    Args:
+        max_in_flight (int, optional): 最多同时进行的渲染数. 默认为 4.
+        max_queue (int, optional): 等待队列的最大长度. 默认为 64.
+        queue_timeout (Optional[float], optional): 在队列中等待的最长时间（秒），为 None 时不限制. 默认为 30 秒.
+        coalesce (bool, optional): 是否合并键相同的并发渲染. 默认为 True.
+    """
+
+    max_in_flight: int
+    max_queue: int
+    queue_timeout: float | None
+    coalesce: bool
+    stats: SchedulerStats
+
+    def __init__(
+        self,
+        max_in_flight: int = 4,
+        *,
+        max_queue: int = 64,
+        queue_timeout: float | None = 30.0,
+        coalesce: bool = True,
+    ) -> None:
+        if max_in_flight < 1:
+            raise ValueError("`max_in_flight` must be at least 1.")
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.coalesce = coalesce
+        self.stats = SchedulerStats()
+        self._in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._seq = itertools.count()
+        self._flights: dict[str, _Flight] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """正在进行的渲染数"""
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        """正在排队的渲染数"""
+        return len(self._waiters)
+
+    async def submit(
+        self,
+        produce: Callable[[], Awaitable[bytes]],
+        *,
+        key: str | None = None,
+        priority: int = 0,
+    ) -> bytes:
+        """在调度器中执行一次渲染
+
+        Args:
+            produce (Callable[[], Awaitable[bytes]]): 实际进行渲染的函数
+            key (Optional[str], optional): 用于合并的键，为 None 时不合并.
+            priority (int, optional): 优先级，越大越先执行. 默认为 0.
+
+        Returns:
+            bytes: 渲染结果
+        """
+        self.stats.submitted += 1
+        if key is None or not self.coalesce:
+            async with self.slot(priority, self.queue_timeout):
+                return await produce()
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.stats.coalesced += 1
+            if (record := current_record()) is not None:
+                record.coalesced = True
+        else:
+            flight = _Flight(asyncio.ensure_future(self._run(produce, priority, self.queue_timeout)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+
+        flight.callers += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.callers -= 1
+            if flight.callers == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0, timeout: float | None = None) -> AsyncGenerator[None, None]:
+        """占用一个渲染名额，名额不足时排队等待
+
+        Args:
+            priority (int, optional): 优先级，越大越先获得名额. 默认为 0.
+            timeout (Optional[float], optional): 在队列中等待的最长时间（秒），为 None 时不限制.
+        """
+        await self._acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _run(self, produce: Callable[[], Awaitable[bytes]], priority: int, timeout: float | None) -> bytes:
+        async with self.slot(priority, timeout):
+            return await produce()
+
+    def _finish(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # 所有调用方都已离开时，避免出现 "exception was never retrieved"
+            flight.task.exception()
+
+    async def _acquire(self, priority: int, timeout: float | None) -> None:
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            self.stats.peak_in_flight = max(self.stats.peak_in_flight, self._in_flight)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.stats.rejected += 1
+            raise QueueFullError(f"Render queue is full ({self.max_queue} waiting).")
+
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        entry = (-priority, next(self._seq), waiter)
+        heapq.heappush(self._waiters, entry)
+        self.stats.queued += 1
+        self.stats.peak_queue = max(self.stats.peak_queue, len(self._waiters))
+        try:
+            with stage("queue"):
+                await asyncio.wait_for(waiter, timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # 名额已经交给了这个请求，将其转交给下一个
+                self._release()
+            else:
+                waiter.cancel()
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats.timed_out += 1
+                raise QueueTimeoutError(f"Render waited in queue for more than {timeout} seconds.") from None
+            raise
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                # 名额直接交给等待者，正在进行的渲染数不变
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
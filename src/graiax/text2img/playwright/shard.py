@@ -0,0 +1,227 @@
+"""浏览器分片
+
+在本地启动多个浏览器进程，将渲染分派到不同的进程上，使吞吐量不再受限于单个浏览器进程.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Literal
+
+from playwright.async_api import Browser, BrowserContext, Playwright, async_playwright
+
+from .metrics import current_record
+
+ShardTarget = Browser | BrowserContext
+ShardStrategy = Literal["least_loaded", "round_robin"]
+
+
+@dataclass
+class ShardStats:
+    """单个分片的负载与统计信息"""
+
+    index: int
+    alive: bool = False
+    in_flight: int = 0
+    renders: int = 0
+    crashes: int = 0
+    restarts: int = 0
+
+
+@dataclass
+class _Shard:
+    stats: ShardStats
+    lock: asyncio.Lock
+    target: ShardTarget | None = None
+    # 持久上下文没有可以检查连接状态的浏览器，通过其 close 事件得知是否已关闭
+    closed: bool = False
+
+    @property
+    def alive(self) -> bool:
+        if self.target is None or self.closed:
+            return False
+        browser = self.target if isinstance(self.target, Browser) else self.target.browser
+        return browser is None or browser.is_connected()
+
+
+class BrowserShards:
+    """浏览器分片
+
+    持有多个浏览器（或浏览器上下文），每次渲染按 `strategy` 选择其中一个. 分片对应的浏览器崩溃或断开后，
+    会在下一次被选中时重新启动.
+
+    用法:
+        ```python
+        shards = BrowserShards(4, strategy="least_loaded")
+        renderer = HTMLRenderer(shards=shards)
+        ...
+        await shards.close()
+        ```
+
+    Args:
+        size (int, optional): 分片数. 每个分片都是一个独立的浏览器进程，请按 CPU 核心数与内存酌情设置. 默认为 2.
+        browser_type (Literal["chromium", "firefox", "webkit"], optional): 要启动的浏览器. 默认为 `chromium`.
+        strategy (Literal["least_loaded", "round_robin"], optional): 分派策略. `least_loaded` 选择正在进行的
+            渲染最少的分片，`round_robin` 依次轮流选择. 默认为 `least_loaded`.
+        launcher (Optional[Callable[[int], Awaitable[Union[Browser, BrowserContext]]]], optional):
+            自定义分片的创建方式，接受分片的下标. 不传入时使用内部的 Playwright 实例启动 `browser_type` 浏览器.
+        max_restarts (Optional[int], optional): 每个分片最多重启的次数，超出后该分片不再使用.
+            为 None 时不限制. 默认为 5.
+        **launch_options: 启动浏览器的参数，详见：https://playwright.dev/python/docs/api/class-browsertype#browser-type-launch
+
+    分片重启时会调用通过 `on_restart` 注册的回调，`HTMLRenderer` 借此关闭页面池中属于旧浏览器的分组.
+    """
+
+    size: int
+    browser_type: Literal["chromium", "firefox", "webkit"]
+    strategy: ShardStrategy
+    max_restarts: int | None
+    launch_options: dict[str, Any]
+
+    def __init__(
+        self,
+        size: int = 2,
+        *,
+        browser_type: Literal["chromium", "firefox", "webkit"] = "chromium",
+        strategy: ShardStrategy = "least_loaded",
+        launcher: Callable[[int], Awaitable[ShardTarget]] | None = None,
+        max_restarts: int | None = 5,
+        **launch_options: Any,
+    ) -> None:
+        self.size = size
+        if self.size < 1:
+            raise ValueError("`size` must be at least 1.")
+        self.browser_type = browser_type
+        self.strategy = strategy
+        self.max_restarts = max_restarts
+        self.launch_options = launch_options
+        self._launcher = launcher
+        self._playwright: Playwright | None = None
+        self._shards = [_Shard(ShardStats(i), asyncio.Lock()) for i in range(self.size)]
+        self._cursor = itertools.count()
+        self._start_lock = asyncio.Lock()
+        self._closed = False
+        self._restart_callbacks: list[Callable[[ShardTarget], Awaitable[None]]] = []
+
+    @property
+    def stats(self) -> list[ShardStats]:
+        """各个分片的负载与统计信息"""
+        return [i.stats for i in self._shards]
+
+    @property
+    def cache_token(self) -> str | None:
+        """渲染缓存使用的标识，由浏览器类型与启动参数决定. 使用自定义的 `launcher` 时无从得知其设置，返回 None"""
+        if self._launcher is not None:
+            return None
+        return f"{self.browser_type}:{json.dumps(self.launch_options, sort_keys=True, default=repr)}"
+
+    def on_restart(self, callback: Callable[[ShardTarget], Awaitable[None]]) -> None:
+        """注册分片重启时的回调，回调接受已崩溃的旧浏览器或浏览器上下文"""
+        self._restart_callbacks.append(callback)
+
+    async def start(self) -> None:
+        """启动所有分片. 不调用时分片会在首次使用时启动"""
+        await asyncio.gather(*(self._ensure(shard) for shard in self._shards))
+
+    async def close(self) -> None:
+        """关闭所有分片"""
+        self._closed = True
+        for shard in self._shards:
+            async with shard.lock:
+                await self._close_target(shard)
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self) -> BrowserShards:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        await self.close()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[ShardTarget, None]:
+        """选择一个分片用于渲染，得到其浏览器或浏览器上下文"""
+        if self._closed:
+            raise RuntimeError("BrowserShards has been closed.")
+        shard = self._select()
+        target = await self._ensure(shard)
+        stats = shard.stats
+        stats.in_flight += 1
+        if (record := current_record()) is not None:
+            record.shard = stats.index
+        try:
+            yield target
+        except BaseException:
+            if shard.target is target and not shard.alive:
+                stats.crashes += 1
+                stats.alive = False
+            raise
+        else:
+            stats.renders += 1
+        finally:
+            stats.in_flight -= 1
+
+    def _usable(self, shard: _Shard) -> bool:
+        return shard.stats.alive or self.max_restarts is None or shard.stats.restarts < self.max_restarts
+
+    def _select(self) -> _Shard:
+        candidates = [i for i in self._shards if self._usable(i)]
+        if not candidates:
+            raise RuntimeError("All browser shards have exceeded `max_restarts`.")
+        start = next(self._cursor) % len(candidates)
+        # 从游标处开始轮换，least_loaded 在负载相同时也会轮流选择
+        rotated = candidates[start:] + candidates[:start]
+        if self.strategy == "round_robin":
+            return rotated[0]
+        return min(rotated, key=lambda i: i.stats.in_flight)
+
+    async def _ensure(self, shard: _Shard) -> ShardTarget:
+        if shard.target is not None and shard.alive:
+            return shard.target
+        async with shard.lock:
+            if shard.target is not None:
+                if shard.alive:
+                    return shard.target
+                # 分片已崩溃，关闭残留的连接后重启
+                crashed = shard.target
+                await self._close_target(shard)
+                shard.stats.restarts += 1
+                for callback in self._restart_callbacks:
+                    await callback(crashed)
+            target = await self._launch(shard.stats.index)
+
+            def on_close(_: object) -> None:
+                if shard.target is target:
+                    shard.closed = True
+
+            target.on("disconnected" if isinstance(target, Browser) else "close", on_close)
+            shard.target, shard.closed = target, False
+            shard.stats.alive = True
+            return target
+
+    async def _launch(self, index: int) -> ShardTarget:
+        if self._launcher is not None:
+            return await self._launcher(index)
+        async with self._start_lock:
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+        return await getattr(self._playwright, self.browser_type).launch(**self.launch_options)
+
+    @staticmethod
+    async def _close_target(shard: _Shard) -> None:
+        target, shard.target = shard.target, None
+        shard.stats.alive = False
+        if target is None:
+            return
+        try:
+            await target.close()
+        except Exception:
+            # 已经崩溃的浏览器无法正常关闭
+            pass
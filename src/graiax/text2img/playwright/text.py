@@ -0,0 +1,19 @@
+"""将纯文本转换为 HTML.
+
+与 Markdown 转换分开，只使用纯文本时无需导入 markdown-it 与 Pygments.
+"""
+
+from __future__ import annotations
+
+
+def convert_text(text: str) -> str:
+    """将纯文本转换为 HTML 代码
+
+    Args:
+        text (str): 待转换的文本
+
+    Returns:
+        str: 生成的 HTML 代码
+    """
+    text = text.replace("\r\n", "\n").replace("\r", "\n").strip()
+    return "".join(('<div class="container">', "".join(f"<p>{s}</p>" for s in text.split("\n")), "</div>"))
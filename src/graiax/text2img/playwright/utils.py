@@ -1,10 +1,15 @@
+from __future__ import annotations
+
 from collections.abc import Callable
 from inspect import isawaitable
-from typing import Any, Concatenate, Generic, Protocol, runtime_checkable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Concatenate, Generic, Protocol, runtime_checkable
 
-from markdown_it import MarkdownIt
 from typing_extensions import ParamSpec
 
+if TYPE_CHECKING:
+    from markdown_it import MarkdownIt
+
 P = ParamSpec("P")
 
 
@@ -68,3 +73,14 @@ async def run_always_await(callable, *args, **kwargs) -> Any:
     while isawaitable(obj):
         obj = await obj
     return obj
+
+
+def write_file(path: Path, data: bytes) -> None:
+    """写入文件，必要时创建父目录
+
+    Args:
+        path (Path): 文件路径
+        data (bytes): 要写入的数据
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
@@ -0,0 +1,85 @@
+"""启动预热
+
+作为 Launart 服务在启动阶段预热渲染器与 Markdown 转换器，使重启后最初的几次渲染不再明显慢于平时.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Literal
+
+from graiax.playwright import PlaywrightService
+from launart import Launart, Service
+from loguru import logger
+
+if TYPE_CHECKING:
+    from .converter import MarkdownConverter
+    from .renderer import HTMLRenderer
+
+
+class WarmupService(Service):
+    """预热服务
+
+    在 Launart 的准备阶段依次预热 Markdown 转换器与渲染器. 渲染器使用 PlaywrightService 时，
+    该服务依赖于 PlaywrightService，在浏览器启动后才进行预热；依赖于本服务的其他服务会等待预热完成后再启动.
+
+    用法:
+        ```python
+        renderer = HTMLRenderer(page_pool=PagePool(4))
+        manager.add_component(PlaywrightService())
+        manager.add_component(WarmupService(renderer))
+        ```
+
+    Args:
+        renderer (Optional[HTMLRenderer], optional): 要预热的渲染器，为 None 时不预热渲染器.
+        converter (Optional[MarkdownConverter], optional): 要预热的转换器，为 None 时预热 `convert_md` 使用的全局转换器.
+        content (Optional[str], optional): 预热渲染器时渲染的 HTML 代码，为 None 时使用内置的示例文档.
+        languages (Optional[Iterable[str]], optional): 预先载入 Lexer 的语言，为 None 时载入所有已知的语言.
+    """
+
+    id = "graiax.text2img.playwright/warmup"
+
+    renderer: HTMLRenderer | None
+    converter: MarkdownConverter | None
+    content: str | None
+    languages: list[str] | None
+
+    def __init__(
+        self,
+        renderer: HTMLRenderer | None = None,
+        converter: MarkdownConverter | None = None,
+        *,
+        content: str | None = None,
+        languages: Iterable[str] | None = None,
+    ) -> None:
+        self.renderer = renderer
+        self.converter = converter
+        self.content = content
+        self.languages = None if languages is None else list(languages)
+        super().__init__()
+
+    @property
+    def required(self) -> set[str]:
+        if self.renderer is not None and self.renderer.shards is None:
+            return {PlaywrightService.id}
+        return set()
+
+    @property
+    def stages(self) -> set[Literal["preparing", "blocking", "cleanup"]]:
+        return {"preparing"}
+
+    async def launch(self, manager: Launart) -> None:
+        async with self.stage("preparing"):
+            begin = time.perf_counter()
+            converter = self.converter
+            if converter is None:
+                from . import _global_md_converter
+
+                converter = _global_md_converter()
+            # 载入 Lexer 等均为同步操作，在线程中进行以免阻塞其他服务的启动
+            await asyncio.to_thread(converter.warmup, self.languages)
+            if self.renderer is not None:
+                await self.renderer.warmup(self.content)
+            logger.info(f"Text2img warmed up in {time.perf_counter() - begin:.2f}s")
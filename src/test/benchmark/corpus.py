@@ -0,0 +1,137 @@
+"""基准测试使用的文档
+
+所有文档均由代码生成，内容固定，保证多次运行之间可以比较.
+"""
+
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+_TEST_MD = Path(__file__).parent.parent / "test.md"
+
+_WORDS = (
+    "graia text2img playwright render browser context page screenshot markdown converter plugin "
+    "container highlight pygments lexer token style layout viewport chromium 渲染 截图 页面 转换 插件 样式"
+).split()
+
+_PYTHON = '''\
+class Renderer:
+    """A tiny renderer used as benchmark input"""
+
+    def __init__(self, width: int = 840, *, scale: float = 1.5) -> None:
+        self.width = width
+        self.scale = scale
+        self._cache: dict[str, bytes] = {}
+
+    async def render(self, content: str) -> bytes:
+        if (cached := self._cache.get(content)) is not None:
+            return cached
+        data = await self._render(content.strip())
+        self._cache[content] = data
+        return data
+'''
+
+_TS = """\
+export async function render(content: string, width = 840): Promise<Uint8Array> {
+  const page = await browser.newPage({ viewport: { width, height: 1 } });
+  try {
+    await page.setContent(`<body>${content}</body>`);
+    return await page.screenshot({ fullPage: true, type: "jpeg", quality: 80 });
+  } finally {
+    await page.close();
+  }
+}
+"""
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def plain_text(lines: int = 400) -> str:
+    """纯文本，用于 `convert_text`"""
+    rng = random.Random(1)
+    return "\n".join(_sentence(rng, rng.randint(4, 24)) for _ in range(lines))
+
+
+def heavy_markdown(sections: int = 40) -> str:
+    """包含标题、列表、引用、表格、任务列表、脚注、容器与代码块的 Markdown"""
+    rng = random.Random(2)
+    parts = [_TEST_MD.read_text(encoding="utf8")]
+    for idx in range(sections):
+        parts.append(
+            f"## 第 {idx} 节 {_sentence(rng, 3)}\n\n"
+            f"{_sentence(rng, 40)} **{_sentence(rng, 3)}** *{_sentence(rng, 2)}* "
+            f"`{rng.choice(_WORDS)}` :smile:[^{idx}]\n\n"
+            + "".join(f"- {_sentence(rng, 8)}\n" for _ in range(5))
+            + "\n"
+            + "".join(f"- [{'x' if i % 2 else ' '}] {_sentence(rng, 5)}\n" for i in range(3))
+            + f"\n> {_sentence(rng, 20)}\n\n"
+            f":::tip\n{_sentence(rng, 16)}\n:::\n\n"
+            f":::warning 小心\n{_sentence(rng, 16)}\n:::\n\n"
+            "| 名称 | 说明 | 数值 |\n| --- | --- | ---: |\n"
+            + "".join(f"| {rng.choice(_WORDS)} | {_sentence(rng, 6)} | {rng.randint(0, 9999)} |\n" for _ in range(6))
+            + f"\n```python\n{_PYTHON}```\n\n"
+            f"[^{idx}]: {_sentence(rng, 6)}\n"
+        )
+    return "\n".join(parts)
+
+
+def code_heavy(blocks: int = 60) -> str:
+    """以代码块为主的 Markdown，包含行号、行高亮与未知语言"""
+    fences = (
+        ("python", _PYTHON),
+        ("ts {2,4-5}", _TS),
+        ("python:no-line-numbers", _PYTHON),
+        ("unknown-language", _TS),
+    )
+    parts = []
+    for idx in range(blocks):
+        info, code = fences[idx % len(fences)]
+        parts.append(f"### 代码 {idx}\n\n```{info}\n{code}```\n")
+    return "\n".join(parts)
+
+
+def container_heavy(blocks: int = 200) -> str:
+    """以自定义容器为主的 Markdown"""
+    rng = random.Random(3)
+    names = ("tip", "warning", "danger")
+    return "\n".join(
+        f":::{names[idx % 3]}{' 标题' if idx % 2 else ''}\n{_sentence(rng, 20)}\n\n- {_sentence(rng, 6)}\n:::\n"
+        for idx in range(blocks)
+    )
+
+
+def long_log(lines: int = 5000) -> str:
+    """一段很长的日志代码块，包含高亮行"""
+    rng = random.Random(5)
+    levels = ("INFO", "DEBUG", "WARNING", "ERROR")
+    body = "".join(
+        f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d} | {rng.choice(levels):<7} | {_sentence(rng, 10)}\n"
+        for i in range(lines)
+    )
+    return f"## 日志\n\n```log {{10-20,{lines // 2},{lines - 5}-{lines}}}\n{body}```\n"
+
+
+def huge_table(rows: int = 2000, columns: int = 8) -> str:
+    """一张很大的 Markdown 表格"""
+    rng = random.Random(4)
+    header = "| " + " | ".join(f"列 {i}" for i in range(columns)) + " |\n"
+    align = "|" + "|".join(" --- " if i % 2 else " ---: " for i in range(columns)) + "|\n"
+    body = "".join(
+        "| " + " | ".join(str(rng.randint(0, 99999)) if i % 2 else rng.choice(_WORDS) for i in range(columns)) + " |\n"
+        for _ in range(rows)
+    )
+    return f"# 大表格\n\n{header}{align}{body}"
+
+
+def markdown_corpus() -> dict[str, str]:
+    """所有 Markdown 文档，键为文档名"""
+    return {
+        "heavy_markdown": heavy_markdown(),
+        "code_heavy": code_heavy(),
+        "container_heavy": container_heavy(),
+        "huge_table": huge_table(),
+        "long_log": long_log(),
+    }
@@ -0,0 +1,114 @@
+"""不启动浏览器的 PlaywrightService 替身
+
+页面的各个方法只做最少的工作并立即返回，用于测量库本身（而不是浏览器）的开销，单元测试也使用这些替身.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from graiax.playwright import PlaywrightService
+from launart import Launart, Service
+from playwright.async_api import Error as PWError
+
+# 一张 1x1 的 JPEG
+_IMAGE = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912130f141d1a1f1e1d1a"
+    "1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001000101011100ffc4001f000001050101010101"
+    "0100000000000000000102030405060708090a0bffda0008010100003f00d2cf20ffd9"
+)
+
+
+class FakePage:
+    def __init__(self, context: FakeContext) -> None:
+        self.context = context
+        self.viewport_size: dict[str, int] | None = {"width": 840, "height": 1}
+        self._closed = False
+        self._content = ""
+
+    async def set_content(self, html: str, **_: Any) -> None:
+        self._content = html
+        await asyncio.sleep(0)
+
+    async def evaluate(self, expression: str, arg: Any = None) -> Any:
+        await asyncio.sleep(0)
+        if "breaks" in expression:
+            height = max(1, len(self._content) // 40)
+            return {"width": 840, "height": height, "breaks": list(range(0, height, 400))}
+        if "getBoundingClientRect" in expression:
+            return {"x": 0, "y": 0, "width": 840, "height": max(1, len(self._content) // 40)}
+        if expression == "1":
+            return 1
+        return None
+
+    async def wait_for_function(self, expression: str, **_: Any) -> None:
+        await asyncio.sleep(0)
+
+    async def set_viewport_size(self, viewport_size: dict[str, int]) -> None:
+        self.viewport_size = viewport_size
+
+    async def screenshot(self, **_: Any) -> bytes:
+        await asyncio.sleep(0)
+        return _IMAGE
+
+    async def route(self, url: str, handler: Any) -> None:
+        pass
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    async def close(self) -> None:
+        self._closed = True
+
+
+class FakeContext:
+    def __init__(self) -> None:
+        self.closed = False
+
+    async def new_page(self) -> FakePage:
+        return FakePage(self)
+
+    async def new_cdp_session(self, page: FakePage) -> Any:
+        raise PWError("CDP is not available in the fake browser")
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakePlaywrightService(Service):
+    """与 PlaywrightService 拥有相同 id 的替身，`HTMLRenderer` 会通过 Launart 取得它"""
+
+    id = PlaywrightService.id
+    browser_type = "chromium"
+    use_persistent_context = False
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._context = FakeContext()
+
+    @property
+    def required(self) -> set[str]:
+        return set()
+
+    @property
+    def stages(self) -> set[str]:
+        return {"preparing"}
+
+    async def launch(self, _: Launart) -> None:
+        async with self.stage("preparing"):
+            pass
+
+    @asynccontextmanager
+    async def page(self, **_: Any) -> AsyncGenerator[FakePage, None]:
+        page = await self._context.new_page()
+        try:
+            yield page
+        finally:
+            await page.close()
+
+    @asynccontextmanager
+    async def context(self, **_: Any) -> AsyncGenerator[FakeContext, None]:
+        yield self._context
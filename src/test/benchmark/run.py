@@ -0,0 +1,383 @@
+"""转换器与渲染器的基准测试
+
+用法:
+    ```shell
+    python src/test/benchmark/run.py                            # 转换器 + 替身浏览器
+    python src/test/benchmark/run.py --suite chromium           # 本地无头 Chromium 端到端
+    python src/test/benchmark/run.py --output result.json
+    python src/test/benchmark/run.py --compare result.json      # 与之前的结果比较
+    python src/test/benchmark/run.py --suite import             # 导入耗时预算检查
+    ```
+
+每个用例先预热，再逐次计时得到延迟分位数与吞吐量，最后在 tracemalloc 下单独运行一次得到 Python 堆的峰值内存.
+导入测试每次都在新的解释器中进行，超出预算或导入了不该导入的模块时以非零状态退出.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import corpus
+import graiax.text2img.playwright
+from fake import FakePlaywrightService
+from graiax.playwright import PlaywrightService
+from launart import Launart, Service
+from markdown_it import MarkdownIt
+
+from graiax.text2img.playwright import HTMLRenderer, MarkdownConverter, PagePool, convert_text
+from graiax.text2img.playwright.converter import DefaultPlugin
+from graiax.text2img.playwright.plugins.code.highlighter import Highlighter
+from graiax.text2img.playwright.plugins.container import DANGER, TIP, WARNING, ContainerGroup
+
+
+@dataclass
+class Result:
+    suite: str
+    name: str
+    document: str
+    iterations: int
+    input_bytes: int
+    output_bytes: int
+    ops_per_sec: float
+    mean_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+    peak_kib: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.suite}/{self.name}/{self.document}"
+
+
+def _percentile(latencies: list[float], q: float) -> float:
+    # nearest-rank
+    return latencies[max(0, math.ceil(q * len(latencies)) - 1)]
+
+
+def _summarize(
+    suite: str, name: str, document: str, latencies: list[float], data: str, output: Any, peak: int
+) -> Result:
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return Result(
+        suite=suite,
+        name=name,
+        document=document,
+        iterations=len(ordered),
+        input_bytes=len(data.encode()),
+        output_bytes=len(output.encode() if isinstance(output, str) else output),
+        ops_per_sec=len(ordered) / total if total else math.inf,
+        mean_ms=total / len(ordered) * 1000,
+        p50_ms=_percentile(ordered, 0.5) * 1000,
+        p90_ms=_percentile(ordered, 0.9) * 1000,
+        p99_ms=_percentile(ordered, 0.99) * 1000,
+        max_ms=ordered[-1] * 1000,
+        peak_kib=peak / 1024,
+    )
+
+
+def bench(suite: str, name: str, document: str, data: str, func: Callable[[], Any], iterations: int) -> Result:
+    for _ in range(min(3, iterations)):
+        func()
+    gc.collect()
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    tracemalloc.start()
+    output = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _summarize(suite, name, document, latencies, data, output, peak)
+
+
+async def abench(
+    suite: str, name: str, document: str, data: str, func: Callable[[], Awaitable[Any]], iterations: int
+) -> Result:
+    for _ in range(min(3, iterations)):
+        await func()
+    gc.collect()
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await func()
+        latencies.append(time.perf_counter() - start)
+    tracemalloc.start()
+    output = await func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _summarize(suite, name, document, latencies, data, output, peak)
+
+
+def converter_suite(iterations: int) -> list[Result]:
+    documents = corpus.markdown_corpus()
+    plain = corpus.plain_text()
+    results = [bench("convert", "convert_text", "plain_text", plain, lambda: convert_text(plain), iterations)]
+
+    try:
+        from graiax.text2img.playwright.raster import TextRasterizer
+    except ImportError:
+        print("Pillow is not installed, skipping TextRasterizer", file=sys.stderr)
+    else:
+        rasterizer = TextRasterizer(scale=1.5)
+        results.append(
+            bench("convert", "TextRasterizer", "plain_text", plain, lambda: rasterizer.render(plain), iterations)
+        )
+
+    converter = MarkdownConverter()
+    for document, text in documents.items():
+        results.append(
+            bench("convert", "MarkdownConverter", document, text, lambda: converter.convert(text), iterations)
+        )
+
+    # 增量转换：每次只修改第一个块，其余块命中缓存
+    incremental = MarkdownConverter(block_cache_size=1024)
+    for document in ("code_heavy", "container_heavy"):
+        text = documents[document]
+        counter = itertools.count()
+        results.append(
+            bench(
+                "convert",
+                "MarkdownConverter[incremental]",
+                document,
+                text,
+                lambda t=text, c=counter: incremental.convert(f"# {next(c)}\n\n{t}"),
+                iterations,
+            )
+        )
+
+    # 单独测量插件：与不带任何插件的转换器比较
+    # 没有代码插件时 markdown-it 会以三个参数调用高亮器，因此不设置高亮器
+    bare = MarkdownConverter(MarkdownIt("gfm-like").enable("table"), default_plugins=(), extra_plugins=())
+    code = MarkdownConverter(default_plugins=(DefaultPlugin.code,), extra_plugins=())
+    code_uncached = MarkdownConverter(
+        default_plugins=(DefaultPlugin.code,), extra_plugins=(), highlighter=Highlighter(cache_size=0)
+    )
+    container = MarkdownConverter(
+        MarkdownIt("gfm-like").enable("table"), default_plugins=(), extra_plugins=(TIP, WARNING, DANGER)
+    )
+    group = MarkdownConverter(
+        MarkdownIt("gfm-like").enable("table"),
+        default_plugins=(),
+        extra_plugins=(ContainerGroup((TIP, WARNING, DANGER)),),
+    )
+    for name, plugin_converter, document in (
+        ("bare", bare, "code_heavy"),
+        ("code_plugin", code, "code_heavy"),
+        ("code_plugin[uncached]", code_uncached, "code_heavy"),
+        ("bare", bare, "container_heavy"),
+        ("container_plugin", container, "container_heavy"),
+        ("container_group", group, "container_heavy"),
+    ):
+        text = documents[document]
+        results.append(
+            bench("plugin", name, document, text, lambda c=plugin_converter, t=text: c.convert(t), iterations)
+        )
+    return results
+
+
+# 语句, 不应导入的模块, 预算 (ms)
+_IMPORTS: dict[str, tuple[str, tuple[str, ...], float]] = {
+    "package": ("import graiax.text2img.playwright", ("playwright", "markdown_it", "pygments"), 50),
+    "convert_text": (
+        "from graiax.text2img.playwright import convert_text",
+        ("playwright", "markdown_it", "pygments"),
+        50,
+    ),
+    "HTMLRenderer": ("from graiax.text2img.playwright import HTMLRenderer", ("markdown_it", "pygments"), 500),
+    "MarkdownConverter": ("from graiax.text2img.playwright import MarkdownConverter", ("playwright",), 500),
+}
+
+_IMPORT_SCRIPT = """\
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [i for i in {forbidden!r} if i in sys.modules]]))
+"""
+
+
+def import_suite(iterations: int) -> tuple[list[Result], list[str]]:
+    """在新的解释器中测量导入耗时，返回结果与超出预算的说明"""
+    src = str(Path(graiax.text2img.playwright.__file__).parents[3])
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, (src, os.environ.get("PYTHONPATH"))))}
+    results: list[Result] = []
+    failures: list[str] = []
+    for name, (statement, forbidden, budget) in _IMPORTS.items():
+        script = _IMPORT_SCRIPT.format(statement=statement, forbidden=forbidden)
+        latencies: list[float] = []
+        imported: set[str] = set()
+        for _ in range(iterations):
+            output = subprocess.run(
+                [sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True
+            ).stdout
+            elapsed, modules = json.loads(output)
+            latencies.append(elapsed)
+            imported.update(modules)
+        result = _summarize("import", name, "-", latencies, statement, "", 0)
+        results.append(result)
+        if imported:
+            failures.append(f"`{statement}` imported {', '.join(sorted(imported))}")
+        if result.p50_ms > budget:
+            failures.append(f"`{statement}` took {result.p50_ms:.1f} ms (p50), over the {budget} ms budget")
+    return results, failures
+
+
+def _renderers() -> dict[str, Callable[[], HTMLRenderer]]:
+    return {
+        "default": lambda: HTMLRenderer(),
+        "page_pool": lambda: HTMLRenderer(page_pool=PagePool(1)),
+        "page_pool+template": lambda: HTMLRenderer(page_pool=PagePool(1), template=True),
+        "page_pool+template+prune_css": lambda: HTMLRenderer(page_pool=PagePool(1), template=True, prune_css=True),
+    }
+
+
+async def renderer_suite(suite: str, iterations: int) -> list[Result]:
+    converter = MarkdownConverter()
+    documents = {"plain_text": convert_text(corpus.plain_text())}
+    documents |= {name: converter.convert(text) for name, text in corpus.markdown_corpus().items()}
+
+    results = []
+    for name, factory in _renderers().items():
+        renderer = factory()
+        try:
+            for document, html in documents.items():
+                results.append(
+                    await abench(suite, name, document, html, lambda r=renderer, h=html: r.render(h), iterations)
+                )
+        finally:
+            if renderer.page_pool is not None:
+                await renderer.page_pool.close()
+    return results
+
+
+class Benchmark(Service):
+    id = "benchmark"
+
+    def __init__(self, suite: str, iterations: int) -> None:
+        super().__init__()
+        self.suite = suite
+        self.iterations = iterations
+        self.results: list[Result] = []
+
+    @property
+    def required(self) -> set[str]:
+        return {PlaywrightService.id}
+
+    @property
+    def stages(self) -> set[str]:
+        return {"blocking"}
+
+    async def launch(self, manager: Launart) -> None:
+        async with self.stage("blocking"):
+            try:
+                self.results = await renderer_suite(self.suite, self.iterations)
+            finally:
+                manager.status.exiting = True
+
+
+def run_renderer_suite(suite: str, iterations: int) -> list[Result]:
+    launart = Launart()
+    if suite == "chromium":
+        launart.add_component(PlaywrightService("chromium", viewport={"width": 840, "height": 1}))
+    else:
+        launart.add_component(FakePlaywrightService())
+    benchmark = Benchmark(suite, iterations)
+    launart.add_component(benchmark)
+    launart.launch_blocking()
+    return benchmark.results
+
+
+def compare(results: list[Result], baseline_path: Path) -> None:
+    baseline = {
+        f"{i['suite']}/{i['name']}/{i['document']}": i
+        for i in json.loads(baseline_path.read_text(encoding="utf8"))["results"]
+    }
+    print(f"\n{'case':<64} {'mean (ms)':>20} {'p99 (ms)':>20} {'peak (KiB)':>22}")
+    for result in results:
+        old = baseline.get(result.key)
+        if old is None:
+            continue
+        print(
+            f"{result.key:<64}"
+            f" {old['mean_ms']:>8.3f} → {result.mean_ms:>8.3f}"
+            f" {old['p99_ms']:>8.3f} → {result.p99_ms:>8.3f}"
+            f" {old['peak_kib']:>9.1f} → {result.peak_kib:>9.1f}"
+            f"  ({(result.mean_ms / old['mean_ms'] - 1) * 100:+.1f}%)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="graiax-text2img-playwright 基准测试")
+    parser.add_argument(
+        "--suite",
+        action="append",
+        choices=("convert", "fake", "chromium", "import"),
+        help="要运行的测试集，可多次指定. 默认为 convert 与 fake",
+    )
+    parser.add_argument("-n", "--iterations", type=int, default=30, help="每个用例的计时次数. 默认为 30")
+    parser.add_argument("-o", "--output", type=Path, help="将结果以 JSON 格式写入该文件")
+    parser.add_argument("--compare", type=Path, help="与该 JSON 文件中的结果比较")
+    args = parser.parse_args()
+    suites: list[str] = args.suite or ["convert", "fake"]
+
+    results: list[Result] = []
+    failures: list[str] = []
+    if "import" in suites:
+        import_results, failures = import_suite(args.iterations)
+        results += import_results
+    if "convert" in suites:
+        results += converter_suite(args.iterations)
+    for suite in ("fake", "chromium"):
+        if suite in suites:
+            suite_results = run_renderer_suite(suite, args.iterations)
+            if not suite_results:
+                print(f"suite `{suite}` produced no results, see the log above", file=sys.stderr)
+            results += suite_results
+
+    print(f"{'case':<64} {'ops/s':>10} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'peak KiB':>10}")
+    for result in results:
+        print(
+            f"{result.key:<64} {result.ops_per_sec:>10.1f} {result.mean_ms:>9.3f} {result.p50_ms:>9.3f}"
+            f" {result.p90_ms:>9.3f} {result.p99_ms:>9.3f} {result.peak_kib:>10.1f}"
+        )
+
+    if args.output is not None:
+        report = {
+            "meta": {
+                "time": datetime.now(timezone.utc).isoformat(),
+                "python": sys.version,
+                "platform": platform.platform(),
+                "iterations": args.iterations,
+            },
+            "results": [asdict(i) for i in results],
+        }
+        args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf8")
+    if args.compare is not None:
+        compare(results, args.compare)
+    if failures:
+        print("\nimport budget exceeded:\n" + "\n".join(f"  {i}" for i in failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
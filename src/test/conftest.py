@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+
+import pytest
+
+from benchmark.fake import FakeContext
+
+
+class ContextFactory:
+    """页面池的 context_factory，记录创建过的上下文，退出时将其关闭"""
+
+    def __init__(self) -> None:
+        self.contexts: list[FakeContext] = []
+
+    @asynccontextmanager
+    async def __call__(self) -> AsyncGenerator[FakeContext, None]:
+        context = FakeContext()
+        self.contexts.append(context)
+        try:
+            yield context
+        finally:
+            await context.close()
+
+
+@pytest.fixture
+def context_factory() -> ContextFactory:
+    return ContextFactory()
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from benchmark.fake import FakeContext, FakePage
+from graiax.text2img.playwright import AssetStore
+
+
+class FakeRoute:
+    def __init__(self) -> None:
+        self.result: tuple[str, dict] | None = None
+
+    async def fulfill(self, **kwargs) -> None:
+        self.result = "fulfill", kwargs
+
+    async def continue_(self) -> None:
+        self.result = "continue", {}
+
+    async def abort(self) -> None:
+        self.result = "abort", {}
+
+
+def _handle(assets: AssetStore, url: str) -> FakeRoute:
+    route = FakeRoute()
+    asyncio.run(assets._handle(FakePage(FakeContext()), route, SimpleNamespace(url=url)))  # type: ignore
+    return route
+
+
+def test_registered_file(tmp_path: Path):
+    (tmp_path / "logo.png").write_bytes(b"png")
+    assets = AssetStore()
+    assets.add_file("https://example.com/logo.png", tmp_path / "logo.png")
+    route = _handle(assets, "https://example.com/logo.png#a")
+    assert route.result == ("fulfill", {"body": b"png", "content_type": "image/png", "status": 200})
+    assert assets.stats.hits == 1
+
+
+@pytest.mark.parametrize(
+    "fallback, result",
+    [("abort", "abort"), (b"empty", "fulfill")],
+)
+def test_missing_file_uses_fallback(tmp_path: Path, fallback, result: str):
+    assets = AssetStore(fallback=fallback)
+    assets.add_file("https://example.com/logo.png", tmp_path / "missing.png")
+    route = _handle(assets, "https://example.com/logo.png")
+    assert route.result is not None and route.result[0] == result
+    assert assets.stats.misses == 1
+
+
+def test_missing_file_passthrough(tmp_path: Path):
+    assets = AssetStore(passthrough=["https://example.com/*"])
+    assets.add_file("https://example.com/logo.png", tmp_path / "missing.png")
+    assert _handle(assets, "https://example.com/logo.png").result == ("continue", {})
+
+
+def test_missing_fallback_file_aborts(tmp_path: Path):
+    assets = AssetStore(fallback=tmp_path / "missing.png")
+    assert _handle(assets, "https://example.com/logo.png").result == ("abort", {})
+    assert (assets.stats.aborted, assets.stats.fallback) == (1, 0)
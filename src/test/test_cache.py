@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from pathlib import Path
+
+from benchmark.fake import FakeContext, FakePlaywrightService
+from graiax.text2img.playwright import HTMLRenderer
+from graiax.text2img.playwright.cache import RenderCache, with_cache_token
+
+
+def _key(html: str = "<p>a</p>", **screenshot_option) -> str | None:
+    return RenderCache.make_key(html, "p{}", screenshot_option, {"viewport": {"width": 840, "height": 1}})
+
+
+def test_make_key_ignores_path():
+    assert _key(type="jpeg", path="a.jpg") == _key(type="jpeg", path="b.jpg") == _key(type="jpeg")
+
+
+def test_make_key_distinguishes_inputs():
+    keys = {
+        _key(),
+        _key("<p>b</p>"),
+        _key(type="png"),
+        RenderCache.make_key("<p>a</p>", "p{color:red}", {}, {"viewport": {"width": 840, "height": 1}}),
+        RenderCache.make_key("<p>a</p>", "p{}", {}, {"viewport": {"width": 420, "height": 1}}),
+        RenderCache.make_key("<p>a</p>", "p{}", {}, {"viewport": {"width": 840, "height": 1}}, variant="x"),
+    }
+    assert len(keys) == 6
+
+
+def test_make_key_modifiers():
+    def modifier(page):
+        pass
+
+    assert RenderCache.make_key("", "", {}, {}, [modifier]) is None
+    assert RenderCache.make_key("", "", {"mask": ["locator"]}, {}) is None
+
+    tokened = with_cache_token(lambda page: None, "v1")
+    assert tokened.cache_token == "v1"
+    key = RenderCache.make_key("", "", {}, {}, [tokened])
+    assert key is not None
+    assert key == RenderCache.make_key("", "", {}, {}, [with_cache_token(lambda page: None, "v1")])
+    assert key != RenderCache.make_key("", "", {}, {}, [with_cache_token(lambda page: None, "v2")])
+    assert key != RenderCache.make_key("", "", {}, {})
+
+
+def test_memory_lru():
+    async def main():
+        cache = RenderCache(max_bytes=10)
+        await cache.set("a", b"1234")
+        await cache.set("b", b"1234")
+        assert await cache.get("a") == b"1234"
+        # a 刚被读取，超出大小时淘汰最久未使用的 b
+        await cache.set("c", b"1234")
+        assert await cache.get("b") is None
+        assert await cache.get("a") == b"1234"
+        assert await cache.get("c") == b"1234"
+        # 超过总大小的结果不进入内存缓存
+        await cache.set("d", b"x" * 11)
+        assert await cache.get("d") is None
+        assert cache.stats.evictions == 1
+        assert cache.stats.memory_hits == 3
+        assert cache.stats.misses == 2
+
+    asyncio.run(main())
+
+
+def test_disk_cache_and_ttl(tmp_path: Path):
+    async def main():
+        key = "ab" * 20
+        await RenderCache(directory=tmp_path, ttl=60).set(key, b"image")
+
+        cache = RenderCache(directory=tmp_path, ttl=60)
+        assert await cache.get(key) == b"image"
+        assert cache.stats.disk_hits == 1
+
+        path = tmp_path / key[:2] / key
+        old = time.time() - 120
+        os.utime(path, (old, old))
+        cache = RenderCache(directory=tmp_path, ttl=60)
+        assert await cache.get(key) is None
+        assert not path.exists()
+
+    asyncio.run(main())
+
+
+def test_disk_eviction(tmp_path: Path):
+    cache = RenderCache(max_bytes=0, directory=tmp_path, disk_max_bytes=25, ttl=None)
+
+    async def main():
+        for i in range(5):
+            await cache.set(f"{i:02d}" * 20, b"x" * 10)
+
+    asyncio.run(main())
+    files = [i for i in tmp_path.glob("??/*") if i.is_file()]
+    assert sum(i.stat().st_size for i in files) <= 25
+    assert cache._disk_size == sum(i.stat().st_size for i in files)
+
+
+def test_disk_concurrent_writes(tmp_path: Path):
+    cache = RenderCache(directory=tmp_path, ttl=None)
+    keys = ["cd" * 20, "ef" * 20]
+
+    async def main():
+        await asyncio.gather(*(cache.set(keys[i % 2], bytes([i]) * (i + 1)) for i in range(40)))
+
+    asyncio.run(main())
+    # 临时文件均已替换或删除，目录大小的统计与实际一致
+    files = [i for i in tmp_path.rglob("*") if i.is_file()]
+    assert sorted(i.name for i in files) == sorted(keys)
+    assert cache._disk_size == sum(i.stat().st_size for i in files)
+
+
+def test_variant_includes_page_source():
+    renderer = HTMLRenderer(cache=RenderCache())
+
+    def variant(service, page_option=None, use_global_context=True):
+        return renderer._cache_variant({}, service, None, None, page_option or {}, use_global_context)
+
+    service = FakePlaywrightService()
+    scaled = FakePlaywrightService()
+    scaled.global_context_config = {"device_scale_factor": 2}
+    firefox = FakePlaywrightService()
+    firefox.browser_type = "firefox"
+    assert len({variant(service), variant(scaled), variant(firefox), variant(service, use_global_context=False)}) == 4
+    # 指定了 page_option 时使用新的上下文，不受全局上下文参数的影响
+    page_option = {"viewport": {"width": 420, "height": 1}}
+    assert variant(service, page_option) == variant(scaled, page_option)
+
+
+def test_explicit_context_is_not_cached():
+    renderer = HTMLRenderer(cache=RenderCache())
+
+    async def main():
+        for _ in range(2):
+            await renderer.render("<p></p>", context=FakeContext())
+
+    asyncio.run(main())
+    assert renderer.cache._memory == {}
+    assert renderer.cache.stats.hits == renderer.cache.stats.misses == 0
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from graiax.text2img.playwright import MarkdownConverter, MdPlugin
+from graiax.text2img.playwright.converter import DefaultPlugin
+from graiax.text2img.playwright.plugins.code import code_plugin
+from graiax.text2img.playwright.plugins.container import DANGER, TIP, WARNING, ContainerGroup
+
+_DOCUMENTS = [
+    (Path(__file__).parent / "test.md").read_text(encoding="utf8"),
+    "# Title\n\nSee [the docs][docs] and [^1].\n\n[docs]: https://example.com\n\n[^1]: Footnote\n",
+    "- a\n- b\n\n  continued\n\n- c\n\n1. one\n2. two\n",
+    "> quote\n> more\n\n| a | b |\n| - | - |\n| 1 | 2 |\n\n<div>\n\nhtml\n\n</div>\n",
+    "```python\nx = 1\n\n\ny = 2\n```\n\n    indented\n\n    code\n\ntext\n",
+    ":::tip\nhello\n\n:::warning 小心\nnested\n:::\n:::\n\n:::danger\nbye\n:::\n",
+    "a\n***\nb\n===\n\nc\n",
+]
+
+
+@pytest.mark.parametrize("document", _DOCUMENTS)
+def test_block_cache_matches_full_render(document: str):
+    plugins = (TIP, WARNING, DANGER)
+    full = MarkdownConverter(extra_plugins=plugins).convert(document)
+    incremental = MarkdownConverter(extra_plugins=plugins, block_cache_size=64)
+    assert incremental.convert(document) == full
+    # 第二次转换命中块缓存，结果不变
+    assert incremental.convert(document) == full
+
+
+def test_block_cache_reuses_unchanged_blocks():
+    converter = MarkdownConverter(block_cache_size=64)
+    template = "# Report\n\n{}\n\n| k | v |\n| - | - |\n| a | 1 |\n\nfooter\n"
+    converter.convert(template.format("first"))
+    hits = converter.block_stats.hits
+    html = converter.convert(template.format("second"))
+    assert html == MarkdownConverter().convert(template.format("second"))
+    assert converter.block_stats.hits > hits
+
+
+@pytest.mark.parametrize("document", _DOCUMENTS)
+def test_container_group_matches_containers(document: str):
+    separate = MarkdownConverter(extra_plugins=(TIP, WARNING, DANGER)).convert(document)
+    grouped = MarkdownConverter(extra_plugins=(ContainerGroup([TIP, WARNING, DANGER]),)).convert(document)
+    assert grouped == separate
+
+
+def test_container_group_rejects_duplicates():
+    with pytest.raises(ValueError):
+        ContainerGroup([TIP, TIP])
+    with pytest.raises(ValueError):
+        ContainerGroup([TIP], marker="::")
+
+
+def _code_converter(**kwargs) -> MarkdownConverter:
+    return MarkdownConverter(
+        default_plugins=[i for i in DefaultPlugin if i is not DefaultPlugin.code],
+        extra_plugins=[MdPlugin(code_plugin, **kwargs)],
+    )
+
+
+def test_code_fold_keeps_lexer_state():
+    body = 'x = """\n' + "\n".join(f"line {i}" for i in range(50)) + '\n"""\ny = 1\n'
+    html = _code_converter(max_lines=10, tail_lines=3).convert(f"```python\n{body}```\n")
+    assert "… 43 more lines" in html
+    tail = html.split("code-fold", 1)[1].split("</pre>", 1)[0]
+    # 末尾的行仍位于多行字符串中
+    assert '<span class="s2">line 49</span>' in tail
+
+
+def test_code_compact_is_opt_in():
+    document = "```python\n" + "x = 1\n" * 20 + "```\n"
+    assert "compact" not in MarkdownConverter().convert(document)
+    assert "line-numbers compact" in _code_converter(compact_lines=10).convert(document)
+
+
+@pytest.mark.parametrize("highlighted", [True, False])
+def test_code_highlights_last_line(highlighted: bool):
+    lang = "js" if highlighted else "unknown-language"
+    html = MarkdownConverter().convert(f"```{lang} {{2}}\na\nb\n```\n")
+    assert '<div class="highlight-lines"><br/><div class="highlight-line">&nbsp;</div></div>' in html
+    assert html.count('<div class="line-number"></div>') == 2
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import io
+import random
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from graiax.text2img.playwright.encoder import fit_bytes  # noqa: E402
+
+
+def _png(width: int = 320, height: int = 240) -> bytes:
+    # 随机噪声难以压缩，便于触发降低质量与缩放
+    rng = random.Random(0)
+    image = Image.frombytes("RGB", (width, height), bytes(rng.randrange(256) for _ in range(width * height * 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_keeps_best_quality_when_it_fits():
+    result = fit_bytes(_png(), 10 * 1024 * 1024, max_quality=85)
+    assert (result.quality, result.scale) == (85, 1.0)
+    assert (result.width, result.height) == (320, 240)
+    assert result.data[:2] == b"\xff\xd8"
+
+
+def test_lowers_quality_before_scale():
+    image = _png()
+    best = fit_bytes(image, 10 * 1024 * 1024)
+    limit = len(best.data) // 2
+    result = fit_bytes(image, limit)
+    assert len(result.data) <= limit
+    assert result.scale == 1.0
+    assert 10 <= result.quality < 90
+
+
+def test_scales_when_quality_is_not_enough():
+    image = _png()
+    smallest = fit_bytes(image, 10 * 1024 * 1024, max_quality=10)
+    limit = len(smallest.data) // 2
+    result = fit_bytes(image, limit)
+    assert len(result.data) <= limit
+    assert 0.25 <= result.scale < 1.0
+    assert result.width < 320
+
+
+def test_webp():
+    result = fit_bytes(_png(), 10 * 1024 * 1024, type="webp")
+    assert result.type == "webp"
+    assert result.data[8:12] == b"WEBP"
+
+
+def test_impossible_limit():
+    with pytest.raises(ValueError):
+        fit_bytes(_png(), 10)
+
+
+@pytest.mark.parametrize("kwargs", [{"min_scale": 0}, {"min_scale": 1.5}, {"min_quality": 50, "max_quality": 40}])
+def test_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        fit_bytes(_png(8, 8), 1024, **kwargs)
+
+
+def _transparent_png() -> bytes:
+    image = Image.new("RGBA", (64, 64), (0, 0, 0, 0))
+    image.paste((255, 0, 0, 255), (0, 0, 32, 64))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_webp_keeps_transparency():
+    result = fit_bytes(_transparent_png(), 10 * 1024 * 1024, type="webp")
+    with Image.open(io.BytesIO(result.data)) as image:
+        assert image.mode == "RGBA"
+        assert image.getpixel((48, 32))[3] == 0
+
+
+def test_jpeg_composites_on_white():
+    result = fit_bytes(_transparent_png(), 10 * 1024 * 1024, max_quality=95)
+    with Image.open(io.BytesIO(result.data)) as image:
+        assert min(image.getpixel((48, 32))) > 240
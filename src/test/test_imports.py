@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import graiax.text2img.playwright
+
+# 导入包时不应加载的重量级依赖，它们在首次使用对应功能时才导入
+_LAZY_MODULES = ("markdown_it", "pygments", "PIL")
+
+
+def test_import_does_not_load_heavy_dependencies():
+    source = Path(graiax.text2img.playwright.__file__).parents[3]
+    code = (
+        "import sys\n"
+        "import graiax.text2img.playwright\n"
+        f"print(','.join(i for i in {_LAZY_MODULES!r} if i in sys.modules))\n"
+    )
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(source), os.environ.get("PYTHONPATH")]))}
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
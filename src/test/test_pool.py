@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from graiax.text2img.playwright.pool import PagePool
+
+
+def test_reuses_pages(context_factory):
+    async def main():
+        pool = PagePool(2)
+        pages = []
+        for _ in range(3):
+            async with pool.page("key", context_factory) as page:
+                pages.append(page)
+        assert len({id(i) for i in pages}) == 1
+        assert (pool.stats.created, pool.stats.reused) == (1, 2)
+        assert len(context_factory.contexts) == 1
+
+    asyncio.run(main())
+
+
+def test_failed_render_discards_page(context_factory):
+    async def main():
+        pool = PagePool(2)
+        with pytest.raises(RuntimeError):
+            async with pool.page("key", context_factory) as page:
+                raise RuntimeError
+        assert page.is_closed()
+        async with pool.page("key", context_factory) as other:
+            assert other is not page
+
+    asyncio.run(main())
+
+
+def test_max_uses(context_factory):
+    async def main():
+        pool = PagePool(1, max_uses=2)
+        pages = []
+        for _ in range(4):
+            async with pool.page("key", context_factory) as page:
+                pages.append(page)
+        assert pages[0] is pages[1] and pages[2] is pages[3] and pages[0] is not pages[2]
+        assert pages[0].is_closed()
+
+    asyncio.run(main())
+
+
+def test_groups(context_factory):
+    async def main():
+        pool = PagePool(1, max_groups=2)
+        for key in ("a", "b", "c"):
+            async with pool.page(key, context_factory):
+                pass
+        # 超出分组上限时关闭最久未使用的分组
+        assert list(pool._slots) == ["b", "c"]
+        assert [i.closed for i in context_factory.contexts] == [True, False, False]
+        await pool.close_groups(lambda key: key == "b")
+        assert list(pool._slots) == ["c"]
+        assert context_factory.contexts[1].closed
+
+    asyncio.run(main())
+
+
+def test_recycles_contexts(context_factory):
+    async def main():
+        pool = PagePool(2, max_context_uses=2)
+        assert pool.recycles_contexts
+        for _ in range(5):
+            async with pool.page("key", context_factory):
+                pass
+        contexts = context_factory.contexts
+        assert len(contexts) == 3
+        assert [i.closed for i in contexts] == [True, True, False]
+        assert pool.stats.recycled_contexts == 2
+        await pool.close()
+        assert contexts[-1].closed
+
+    asyncio.run(main())
+
+
+def test_retired_context_waits_for_borrowed_pages(context_factory):
+    async def main():
+        pool = PagePool(2, max_context_uses=2)
+        held = pool.page("key", context_factory)
+        page = await held.__aenter__()
+        for _ in range(2):
+            async with pool.page("key", context_factory):
+                pass
+        # 上下文已被回收，但借出的页面归还前不会关闭
+        first = context_factory.contexts[0]
+        assert pool.stats.recycled_contexts == 1
+        assert not first.closed and not page.is_closed()
+        await held.__aexit__(None, None, None)
+        assert first.closed and page.is_closed()
+        async with pool.page("key", context_factory) as page:
+            assert page.context is context_factory.contexts[1]
+
+    asyncio.run(main())
+
+
+def test_evicts_idle_pages_in_background(context_factory):
+    async def main():
+        pool = PagePool(1, idle_timeout=0.05)
+        async with pool.page("key", context_factory):
+            pass
+        # 之后没有渲染，闲置的分组仍会被关闭
+        await asyncio.sleep(0.2)
+        assert not pool._slots
+        assert context_factory.contexts[0].closed
+        assert pool.stats.evicted == 1
+        assert pool._evictor is not None and pool._evictor.done()
+
+        async with pool.page("key", context_factory):
+            assert not pool._evictor.done()
+        await pool.close()
+        assert pool._evictor is None
+
+    asyncio.run(main())
+
+
+def test_waiting_acquire_retries_after_group_closed(context_factory):
+    async def main():
+        pool = PagePool(1)
+        held = pool.page("key", context_factory)
+        first = await held.__aenter__()
+        waiting = asyncio.create_task(pool.acquire("key", context_factory))
+        await asyncio.sleep(0)
+        await pool.close_groups(lambda key: True)
+        slot, pooled = await waiting
+        assert not slot.closed and pool._slots["key"] is slot
+        assert pooled.page.context is context_factory.contexts[1]
+        await held.__aexit__(None, None, None)
+        assert first.is_closed() and context_factory.contexts[0].closed
+        await pool.release(slot, pooled)
+        await pool.close()
+        assert all(i.closed for i in context_factory.contexts)
+
+    asyncio.run(main())
+
+
+def test_context_created_for_closed_group_is_closed(context_factory):
+    async def main():
+        pool = PagePool(1)
+        entered = asyncio.Event()
+        gate = asyncio.Event()
+
+        @asynccontextmanager
+        async def slow_factory():
+            async with context_factory() as context:
+                if not gate.is_set():
+                    entered.set()
+                    await gate.wait()
+                yield context
+
+        task = asyncio.create_task(pool.acquire("key", slow_factory))
+        await entered.wait()
+        await pool.close_groups(lambda key: True)
+        gate.set()
+        slot, pooled = await task
+        # 分组关闭期间创建的上下文不会泄漏，页面在新的分组中创建
+        assert context_factory.contexts[0].closed
+        assert pooled.page.context is context_factory.contexts[1]
+        await pool.release(slot, pooled)
+        await pool.close()
+        assert all(i.closed for i in context_factory.contexts)
+
+    asyncio.run(main())
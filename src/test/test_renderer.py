@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from graiax.text2img.playwright import HTMLRenderer, PagePool
+from graiax.text2img.playwright.renderer import _check_screenshot_option, _tile_ranges
+
+
+def test_extra_page_modifiers_do_not_create_pool_groups(context_factory):
+    async def main():
+        pages = []
+        calls: list[str] = []
+        renderer = HTMLRenderer(page_pool=PagePool(2), page_modifiers=[pages.append])
+        async with context_factory() as context:
+            for i in range(3):
+                modifier = lambda page, i=i: calls.append(f"extra {i}")  # noqa: E731
+                assert await renderer.render(f"<p>{i}</p>", context=context, extra_page_modifiers=[modifier])
+            for i in range(2):
+                await renderer.render(f"<p>{i}</p>", context=context)
+        assert len(renderer.page_pool._slots) == 1
+        assert calls == ["extra 0", "extra 1", "extra 2"]
+        # 执行过额外 page_modifiers 的页面不会被归还，之后的渲染复用同一个新页面
+        assert [page.is_closed() for page in pages] == [True, True, True, False]
+
+    asyncio.run(main())
+
+
+def _covers(ranges: list[tuple[int, int]], height: int, max_height: int) -> bool:
+    return (
+        ranges[0][0] == 0
+        and ranges[-1][1] == height
+        and all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        and all(0 < end - start <= max_height for start, end in ranges)
+    )
+
+
+def test_tile_ranges_single_tile():
+    assert _tile_ranges(500, [100, 200], 1000) == [(0, 500)]
+    assert _tile_ranges(1000, [], 1000) == [(0, 1000)]
+
+
+def test_tile_ranges_prefers_breaks():
+    ranges = _tile_ranges(10000, [0, 3000, 5000], 4000)
+    assert ranges == [(0, 3000), (3000, 5000), (5000, 9000), (9000, 10000)]
+    assert _covers(ranges, 10000, 4000)
+
+
+def test_tile_ranges_without_usable_breaks():
+    # 断点超出范围或距离上一块过远时按 max_height 硬切
+    ranges = _tile_ranges(2500, [-10, 2500, 3000], 1000)
+    assert ranges == [(0, 1000), (1000, 2000), (2000, 2500)]
+
+
+@pytest.mark.parametrize("height", [1, 999, 1000, 1001, 12345])
+def test_tile_ranges_cover_height(height: int):
+    breaks = list(range(0, height, 370))
+    assert _covers(_tile_ranges(height, breaks, 1000), height, 1000)
+
+
+def test_webp_mask_path_rejected():
+    with pytest.raises(ValueError):
+        _check_screenshot_option({"type": "webp", "mask": ["locator"], "path": "a.webp"})
+    _check_screenshot_option({"type": "webp", "mask": ["locator"]})
+    _check_screenshot_option({"type": "webp", "path": "a.webp"})
+
+
+def test_webp_fallback_does_not_write_path(context_factory, tmp_path):
+    path = tmp_path / "a.webp"
+
+    async def main():
+        renderer = HTMLRenderer()
+        async with context_factory() as context:
+            # 替身浏览器不支持 CDP，无法截取 WebP
+            assert await renderer.render("<p></p>", context=context, extra_screenshot_option={"type": "webp"})
+            with pytest.raises(ValueError):
+                await renderer.render(
+                    "<p></p>", context=context, extra_screenshot_option={"type": "webp", "path": path}
+                )
+
+    asyncio.run(main())
+    assert not path.exists()
+
+
+def test_render_fit_rejects_transparent_jpeg():
+    async def main():
+        with pytest.raises(ValueError):
+            await HTMLRenderer().render_fit("<p></p>", 1024, extra_screenshot_option={"omit_background": True})
+
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from graiax.text2img.playwright.scheduler import QueueFullError, QueueTimeoutError, RenderScheduler
+
+
+def _blocked(event: asyncio.Event, result: bytes = b"", log: list[bytes] | None = None):
+    async def produce() -> bytes:
+        await event.wait()
+        if log is not None:
+            log.append(result)
+        return result
+
+    return produce
+
+
+def test_max_in_flight_and_priority():
+    async def main():
+        scheduler = RenderScheduler(1, queue_timeout=None)
+        release = asyncio.Event()
+        order: list[bytes] = []
+        first = asyncio.create_task(scheduler.submit(_blocked(release, b"first", order)))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(scheduler.submit(_blocked(release, name, order), priority=priority))
+            for name, priority in ((b"low", 0), (b"high", 10), (b"low2", 0))
+        ]
+        await asyncio.sleep(0)
+        assert (scheduler.in_flight, scheduler.queued) == (1, 3)
+        release.set()
+        await asyncio.gather(first, *tasks)
+        # 优先级高的先执行，同一优先级先到先得
+        assert order == [b"first", b"high", b"low", b"low2"]
+        assert scheduler.stats.peak_in_flight == 1
+        assert (scheduler.in_flight, scheduler.queued) == (0, 0)
+
+    asyncio.run(main())
+
+
+def test_queue_bounds():
+    async def main():
+        scheduler = RenderScheduler(1, max_queue=1, queue_timeout=0.05)
+        release = asyncio.Event()
+        running = asyncio.create_task(scheduler.submit(_blocked(release)))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(scheduler.submit(_blocked(release)))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await scheduler.submit(_blocked(release))
+        with pytest.raises(QueueTimeoutError):
+            await queued
+        release.set()
+        await running
+        assert (scheduler.stats.rejected, scheduler.stats.timed_out) == (1, 1)
+        assert (scheduler.in_flight, scheduler.queued) == (0, 0)
+
+    asyncio.run(main())
+
+
+def test_invalid_max_in_flight():
+    with pytest.raises(ValueError):
+        RenderScheduler(0)
+
+
+def test_coalesces_same_key():
+    async def main():
+        scheduler = RenderScheduler(2)
+        release = asyncio.Event()
+        calls: list[bytes] = []
+        tasks = [asyncio.create_task(scheduler.submit(_blocked(release, b"image", calls), key="k")) for _ in range(3)]
+        other = asyncio.create_task(scheduler.submit(_blocked(release, b"other", calls), key="o"))
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*tasks) == [b"image"] * 3
+        assert await other == b"other"
+        assert sorted(calls) == [b"image", b"other"]
+        assert scheduler.stats.coalesced == 2
+        # 完成后不再合并
+        assert await scheduler.submit(_blocked(release, b"again", calls), key="k") == b"again"
+
+    asyncio.run(main())
+
+
+def test_coalesced_error_is_shared():
+    async def main():
+        scheduler = RenderScheduler(1)
+
+        async def produce() -> bytes:
+            await asyncio.sleep(0)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(*(scheduler.submit(produce, key="k") for _ in range(2)), return_exceptions=True)
+        assert all(isinstance(i, RuntimeError) for i in results)
+
+    asyncio.run(main())
+
+
+def test_cancel_all_callers_cancels_render():
+    async def main():
+        scheduler = RenderScheduler(1)
+        release = asyncio.Event()
+        calls: list[bytes] = []
+        tasks = [asyncio.create_task(scheduler.submit(_blocked(release, b"x", calls), key="k")) for _ in range(2)]
+        await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.sleep(0)
+        assert calls == []
+        assert scheduler.in_flight == 0
+
+    asyncio.run(main())